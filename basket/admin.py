@@ -1,33 +1,211 @@
 import json
+import operator
+from functools import reduce
 
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
 from django.forms.models import ModelForm
+from django.utils.functional import cached_property
 
-from basket.models import Country, Game, League, Profile, Team
+from basket.assignment import bulk_assign
+from basket.models import (
+    Country,
+    Game,
+    League,
+    Profile,
+    QuarantinedGame,
+    RefreshJob,
+    Team,
+)
 
 User = get_user_model()
 
+# Larger terms cannot be an integer primary key
+MAX_PK = 2**31 - 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using PostgreSQL's row estimate for unfiltered changelists.
+
+    ``COUNT(*)`` scans the whole table, which gets slow with millions of
+    rows. Filtered lists and small tables are still counted exactly.
+    """
+
+    # Tables estimated below this size are counted exactly
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate()
+        if estimate is not None and estimate > self.threshold:
+            return estimate
+        return super().count
+
+    def estimate(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or queryset.query.where:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # -1 until the table is first analyzed
+        return int(row[0]) if row and row[0] >= 0 else None
+
+
+class PrimaryKeySearchMixin:
+    """Search the primary key through its index.
+
+    Django compares ``"=id"`` as text (``UPPER(id::text) = ...``), which no
+    index serves, and ORed with the other search fields it keeps their
+    indexes from being used too. List ``"pk"`` in ``search_fields``
+    instead: numeric terms then match the primary key exactly, and the
+    other fields are searched with ``icontains`` as usual.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        words = search_term.split()
+        if "pk" not in search_fields or not words:
+            return super().get_search_results(request, queryset, search_term)
+        fields = [field for field in search_fields if field != "pk"]
+        condition = Q()
+        if fields:
+            for word in words:
+                condition &= reduce(
+                    operator.or_,
+                    (Q(**{f"{field}__icontains": word}) for field in fields),
+                )
+        else:
+            condition = Q(pk__in=[])
+        term = search_term.strip()
+        if term.isdigit() and int(term) <= MAX_PK:
+            condition |= Q(pk=int(term))
+        return queryset.filter(condition), False
+
+
+class LargeTableAdmin(PrimaryKeySearchMixin, admin.ModelAdmin):
+    """Changelist settings for tables too big to count or list in full"""
+
+    paginator = EstimatedCountPaginator
+    # Skips the second COUNT(*) of the whole table when searching
+    show_full_result_count = False
+    # Sorting by anything unindexed would sort the whole table
+    ordering = ("pk",)
+
 
 class CountryAdmin(admin.ModelAdmin):
-    pass
+    list_display = ("id", "name", "code")
+    search_fields = ("name", "code")
 
 
-class GameAdmin(admin.ModelAdmin):
-    list_display = ("game", "date", "league", "country")
+class GameActionForm(ActionForm):
+    # A user ID, as listing every user would not scale
+    user = forms.ModelChoiceField(
+        queryset=User.objects.all(),
+        required=False,
+        widget=forms.TextInput(attrs={"placeholder": "User ID", "size": 8}),
+    )
+
+
+class GameAdmin(LargeTableAdmin):
+    list_display = ("id", "game", "date", "league", "country", "user")
+    list_select_related = (
+        "home_team",
+        "away_team",
+        "league",
+        "country",
+        "user",
+    )
+    # All backed by indexes on Game. The date filter uses ranges, while
+    # date_hierarchy would scan the table for the distinct years and months.
+    list_filter = (
+        ("date", admin.DateFieldListFilter),
+        "country",
+        ("user", admin.EmptyFieldListFilter),
+    )
+    ordering = ("-date", "-id")
+    search_fields = ("pk",)
+    autocomplete_fields = (
+        "league",
+        "country",
+        "home_team",
+        "away_team",
+        "user",
+    )
+    action_form = GameActionForm
+    actions = ("assign_to_user", "unassign")
 
     @admin.display(description="Game")
     def game(self, obj):
-        return str(obj)
+        return f"{obj.home_team.name} vs. {obj.away_team.name}"
 
+    @admin.action(description="Assign selected games to user")
+    def assign_to_user(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields["action"].choices = self.get_action_choices(request)
+        user = form.cleaned_data["user"] if form.is_valid() else None
+        if user is None:
+            self.message_user(
+                request, "Pick a user to assign the games to.", messages.ERROR
+            )
+            return
+        self.report(request, bulk_assign(self.selected_ids(queryset), user))
+
+    @admin.action(description="Unassign selected games")
+    def unassign(self, request, queryset):
+        self.report(request, bulk_assign(self.selected_ids(queryset), None))
+
+    def selected_ids(self, queryset):
+        return list(queryset.values_list("pk", flat=True))
+
+    def report(self, request, results):
+        counts = {}
+        for result in results:
+            counts[result["result"]] = counts.get(result["result"], 0) + 1
+        summary = ", ".join(
+            f"{count} {name.replace('_', ' ')}"
+            for name, count in counts.items()
+        )
+        level = messages.WARNING if "forbidden" in counts else messages.SUCCESS
+        self.message_user(request, f"Games: {summary}.", level)
 
-class LeagueAdmin(admin.ModelAdmin):
-    pass
 
+class LeagueAdmin(LargeTableAdmin):
+    list_display = ("id", "name", "season", "type")
+    list_filter = ("season",)
+    # Name searches use the trigram index of migration 0010 on PostgreSQL
+    search_fields = ("pk", "name")
 
-class TeamAdmin(admin.ModelAdmin):
-    pass
+
+class TeamAdmin(LargeTableAdmin):
+    list_display = ("id", "name")
+    search_fields = ("pk", "name")
+
+
+class RefreshJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "querystring", "created_at", "worker")
+    list_filter = ("status",)
+
+
+class QuarantinedGameAdmin(admin.ModelAdmin):
+    list_display = ("id", "game_id", "first_error", "created_at")
+    search_fields = ("game_id",)
+
+    @admin.display(description="Error")
+    def first_error(self, obj):
+        return obj.errors[0] if obj.errors else ""
 
 
 class AlwaysChangedModelForm(ModelForm):
@@ -40,6 +218,7 @@ class ProfileInline(admin.StackedInline):
     form = AlwaysChangedModelForm
     verbose_name_plural = "profile"
     extra = 0
+    autocomplete_fields = ("countries",)
 
 
 def custom_data(self):
@@ -55,7 +234,12 @@ def custom_data(self):
     )
 
 
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(PrimaryKeySearchMixin, BaseUserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Only indexed columns, also used by the user autocomplete of games
+    search_fields = ("pk", "username")
+
     def change_view(self, *args, **kwargs):
         self.inlines = (ProfileInline,)
         return super().change_view(*args, **kwargs)
@@ -81,4 +265,6 @@ admin.site.register(User, UserAdmin)
 admin.site.register(Country, CountryAdmin)
 admin.site.register(Game, GameAdmin)
 admin.site.register(League, LeagueAdmin)
+admin.site.register(QuarantinedGame, QuarantinedGameAdmin)
+admin.site.register(RefreshJob, RefreshJobAdmin)
 admin.site.register(Team, TeamAdmin)
@@ -0,0 +1,180 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+
+from basket import cache, routers
+from basket.exceptions import ConflictException
+from basket.models import Game, Profile
+
+
+def user_countries(user):
+    """Country ids (or a subquery) the user is allowed to work on"""
+    # Set by BearerTokenAuthentication from its token cache
+    countries = getattr(user, "country_ids", None)
+    if countries is None:
+        countries = Profile.countries.through.objects.filter(
+            profile__user=user
+        ).values("country_id")
+    return countries
+
+
+def game_pk(value):
+    """``value`` (e.g. a URL kwarg) as a game id, or ``NotFound``"""
+    try:
+        return Game._meta.pk.to_python(value)
+    except ValidationError:
+        raise NotFound()
+
+
+def assign_game(game_id, user, queryset=Game.objects):
+    """Assign a game to ``user`` with a single conditional UPDATE.
+
+    The row is only written if it is still unassigned and belongs to one of
+    the user's countries, so concurrent requests cannot overwrite each
+    other's claim. Assigning a game the user already holds is a no-op.
+    Returns the game loaded from ``queryset``. Raises ``NotFound`` if the
+    game does not exist or is outside the user's countries and
+    ``ConflictException`` if somebody else holds it.
+    """
+    game_id = game_pk(game_id)
+    countries = user_countries(user)
+    games = Game.objects.filter(pk=game_id, country__in=countries)
+    assigned = games.filter(user=None).update(
+        user=user, updated_at=timezone.now()
+    )
+    if not assigned:
+        current = games.values("user_id").first()
+        if current is None:
+            raise NotFound()
+        if current["user_id"] != user.pk:
+            raise ConflictException()
+
+    game = queryset.get(pk=game_id)
+    if assigned:
+        # QuerySet.update() does not send post_save
+        transaction.on_commit(
+            lambda: _invalidate_cache([game.country_id], user.pk)
+        )
+    return game
+
+
+async def aassign_game(game_id, user, queryset=Game.objects):
+    """``assign_game`` for async views, with the same queries"""
+    game_id = game_pk(game_id)
+    countries = user_countries(user)
+    games = Game.objects.filter(pk=game_id, country__in=countries)
+    assigned = await games.filter(user=None).aupdate(
+        user=user, updated_at=timezone.now()
+    )
+    if not assigned:
+        current = await games.values("user_id").afirst()
+        if current is None:
+            raise NotFound()
+        if current["user_id"] != user.pk:
+            raise ConflictException()
+
+    game = await queryset.aget(pk=game_id)
+    if assigned:
+        # Async views run in autocommit mode, the update is already committed
+        _invalidate_cache([game.country_id], user.pk)
+        # No replica_reads() block saw the write, mark the user ourselves
+        routers.stick(user.pk)
+    return game
+
+
+def claim_next_game(user, queryset=Game.objects):
+    """Assign the earliest unassigned game in ``queryset`` to ``user``.
+
+    Candidates are limited to the user's countries and ordered by date. On
+    Postgres the candidate row is locked with ``FOR UPDATE SKIP LOCKED``, so
+    concurrent callers each get a different game without waiting on each
+    other. Backends without row locks (SQLite) rely on the conditional
+    UPDATE alone and retry with the next candidate when they lose a race.
+    Returns the claimed game, or ``None`` if nothing is left to claim.
+    """
+    candidates = (
+        queryset.filter(user=None, country__in=user_countries(user))
+        .order_by("date", "id")
+        .values_list("pk", "country_id")
+    )
+    while True:
+        with transaction.atomic():
+            candidate = candidates.select_for_update(
+                skip_locked=True, of=("self",)
+            ).first()
+            if candidate is None:
+                return None
+            game_id, country_id = candidate
+            claimed = Game.objects.filter(pk=game_id, user=None).update(
+                user=user, updated_at=timezone.now()
+            )
+            if claimed:
+                transaction.on_commit(
+                    lambda: _invalidate_cache([country_id], user.pk)
+                )
+        if claimed:
+            return queryset.get(pk=game_id)
+
+
+BULK_RESULTS = ("assigned", "unassigned", "unchanged", "forbidden", "not_found")
+
+
+def bulk_assign(game_ids, user):
+    """Assign many games to ``user`` (or unassign them if ``user`` is None).
+
+    Admins may take games away from their current holders, but the new
+    holder must still cover each game's country. Countries are checked
+    against the user's profile in one query and every allowed game is
+    written with one UPDATE inside a single transaction, so the cost does
+    not depend on the number of games. Returns a list of ``{"id", "result"}``
+    dicts in input order, where result is one of ``BULK_RESULTS``.
+    """
+    game_ids = list(dict.fromkeys(game_ids))
+    with transaction.atomic():
+        games = {
+            pk: (country_id, user_id)
+            for pk, country_id, user_id in Game.objects.filter(pk__in=game_ids)
+            .select_for_update()
+            .values_list("pk", "country_id", "user_id")
+        }
+        allowed = None
+        if user is not None and games:
+            allowed = set(
+                Profile.countries.through.objects.filter(
+                    profile__user=user
+                ).values_list("country_id", flat=True)
+            )
+
+        target = user.pk if user is not None else None
+        report = []
+        to_update = []
+        for pk in game_ids:
+            if pk not in games:
+                result = "not_found"
+            elif allowed is not None and games[pk][0] not in allowed:
+                result = "forbidden"
+            elif games[pk][1] == target:
+                result = "unchanged"
+            else:
+                result = "assigned" if user is not None else "unassigned"
+                to_update.append(pk)
+            report.append({"id": pk, "result": result})
+
+        if to_update:
+            Game.objects.filter(pk__in=to_update).update(
+                user=user, updated_at=timezone.now()
+            )
+            countries = {games[pk][0] for pk in to_update}
+            holders = {games[pk][1] for pk in to_update} | {target}
+            holders.discard(None)
+            transaction.on_commit(
+                lambda: _invalidate_cache(countries, *holders)
+            )
+    return report
+
+
+def _invalidate_cache(country_ids, *user_ids):
+    cache.invalidate_countries(country_ids)
+    for user_id in user_ids:
+        cache.invalidate_user(user_id)
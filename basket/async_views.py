@@ -0,0 +1,150 @@
+"""Async versions of the game list, detail and assign endpoints.
+
+Served under ``/async/`` for ASGI deployments (``project/asgi.py``). They
+use Django's async ORM interface, so one process can serve many clients
+while each request waits on the database. Responses match their
+``GameViewSet`` counterparts, except that lists skip the response cache
+and conditional GET and are only offered as JSON.
+
+Refreshes requested here are queued like any other, then run by this
+process on the async RapidAPI client unless a worker claims them first.
+"""
+import asyncio
+from functools import wraps
+
+from django.http import HttpResponse
+from django.urls import reverse
+from rest_framework.exceptions import (
+    APIException,
+    MethodNotAllowed,
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+)
+from rest_framework.request import Request
+
+from basket import metrics
+from basket.assignment import aassign_game
+from basket.auth import BearerTokenAuthentication
+from basket.ingest import upstream_queries
+from basket.jobs import aclaim_job_in_process, aenqueue_refresh, arun_job
+from basket.renderers import JSONRenderer
+from basket.serializers import GameSerializer
+from basket.views import GameViewSet, game_querystring, visible_games
+
+authentication = BearerTokenAuthentication()
+renderer = JSONRenderer()
+
+# Refreshes running in this process. The event loop only keeps weak
+# references to tasks.
+background_tasks = set()
+
+
+def render(data, status=200, headers=None):
+    return HttpResponse(
+        renderer.render(data),
+        status=status,
+        headers=headers,
+        content_type=renderer.media_type,
+    )
+
+
+def api_view(methods):
+    """Authenticate requests to an async view and render API exceptions
+    the way DRF does"""
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                result = await authentication.aauthenticate(request)
+                if result is None:
+                    raise NotAuthenticated()
+                request.user, request.auth = result
+                if request.method not in methods:
+                    raise MethodNotAllowed(request.method)
+                return await view(request, *args, **kwargs)
+            except APIException as e:
+                headers = {}
+                if e.status_code == 401:
+                    headers["WWW-Authenticate"] = authentication.keyword
+                detail = e.detail
+                if not isinstance(detail, (list, dict)):
+                    detail = {"detail": detail}
+                return render(detail, e.status_code, headers)
+
+        # Like DRF's views. Django's csrf_exempt would hide the coroutine.
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+def games(request):
+    return visible_games(
+        GameViewSet.queryset, request.user, game_querystring(request.GET)
+    )
+
+
+@api_view(["GET"])
+async def game_list(request):
+    if request.GET.get("refresh"):
+        return await refresh(request)
+    serializer = GameViewSet.fast_serializer
+    paginator = GameViewSet.pagination_class()
+    rows = games(request).values(*serializer.columns)
+    page = paginator.set_page(
+        [row async for row in paginator.page_queryset(rows, Request(request))]
+    )
+    with metrics.timer("serialize"):
+        data = [serializer.to_representation(row) for row in page]
+    return render(paginator.get_paginated_data(data))
+
+
+@api_view(["GET"])
+async def game_detail(request, pk):
+    serializer = GameViewSet.fast_serializer
+    row = (
+        await games(request).filter(pk=pk).values(*serializer.columns).afirst()
+    )
+    if row is None:
+        raise NotFound()
+    with metrics.timer("serialize"):
+        data = serializer.to_representation(row)
+    return render(data)
+
+
+@api_view(["PATCH"])
+async def game_assign(request, pk):
+    game = await aassign_game(pk, request.user, queryset=GameViewSet.queryset)
+    with metrics.timer("serialize"):
+        data = GameSerializer(game).data
+    return render(data)
+
+
+async def refresh(request):
+    if not request.user.is_staff:
+        raise PermissionDenied(
+            "Only admin users can refresh the local DB with data from "
+            "RapidAPI."
+        )
+    querystring = game_querystring(request.GET)
+    # Reject bad date ranges now rather than in the background
+    upstream_queries(querystring)
+    job = await aenqueue_refresh(querystring, user=request.user)
+    task = asyncio.create_task(run_in_process(job))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    url = request.build_absolute_uri(
+        reverse("refreshjob-detail", kwargs={"pk": job.pk})
+    )
+    return render(
+        {"id": job.pk, "status": job.status, "url": url},
+        status=202,
+        headers={"Location": url},
+    )
+
+
+async def run_in_process(job):
+    if await aclaim_job_in_process(job):
+        await arun_job(job)
@@ -1,18 +1,175 @@
-from rest_framework.authentication import TokenAuthentication
+import copy
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import AuthenticationFailed
 
+from basket import metrics, routers
+from basket.models import Profile
+
+
+class TokenCache:
+    """Thread-safe LRU cache of token key -> (token, user, country ids).
+
+    Entries expire after ``AUTH_TOKEN_CACHE_TTL`` seconds and at most
+    ``AUTH_TOKEN_CACHE_SIZE`` entries are kept (0 disables the cache).
+    Signal handlers in ``basket.signals`` drop entries when a token, its
+    user or the user's countries change. Invalidation only reaches the
+    current process, so other workers rely on the TTL.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._keys_by_user = defaultdict(set)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key, token, user, country_ids):
+        size = settings.AUTH_TOKEN_CACHE_SIZE
+        if size <= 0:
+            return
+        expires = time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (expires, (token, user, tuple(country_ids)))
+            self._keys_by_user[user.pk].add(key)
+            while len(self._entries) > size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            user_id = entry[1][1].pk
+            self._keys_by_user[user_id].discard(key)
+            if not self._keys_by_user[user_id]:
+                del self._keys_by_user[user_id]
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def stats(self):
+        with self._lock:
+            result = dict(self._stats, size=len(self._entries))
+        total = result["hits"] + result["misses"]
+        result["hit_rate"] = result["hits"] / total if total else 0.0
+        return result
+
+
+token_cache = TokenCache()
+
 
 class BearerTokenAuthentication(TokenAuthentication):
     keyword = "Bearer"
 
-    def authenticate_credentials(self, key):
+    def authenticate(self, request):
+        with metrics.timer("auth"), routers.replica_reads():
+            key = self.get_key(request)
+            if key is None:
+                return None
+            return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        """``authenticate()`` for async views, using the async ORM"""
+        with metrics.timer("auth"), routers.replica_reads():
+            key = self.get_key(request)
+            if key is None:
+                return None
+            entry = token_cache.get(key)
+            if entry is None:
+                try:
+                    token = await Token.objects.select_related("user").aget(
+                        key=key
+                    )
+                except Token.DoesNotExist:
+                    raise AuthenticationFailed("Invalid token")
+                country_ids = [
+                    country_id async for country_id in self.country_ids(token)
+                ]
+                entry = self.cache(key, token, country_ids)
+            return self.credentials(entry)
+
+    def get_key(self, request):
+        """The token in the ``Authorization`` header, or None"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise AuthenticationFailed(
+                "Invalid token header. No credentials provided."
+            )
+        if len(auth) > 2:
+            raise AuthenticationFailed(
+                "Invalid token header. Token string should not contain spaces."
+            )
         try:
-            token = Token.objects.get(key=key)
-        except Token.DoesNotExist:
-            raise AuthenticationFailed("Invalid token")
+            return auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(
+                "Invalid token header. Token string should not contain "
+                "invalid characters."
+            )
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            try:
+                token = Token.objects.select_related("user").get(key=key)
+            except Token.DoesNotExist:
+                raise AuthenticationFailed("Invalid token")
+            entry = self.cache(key, token, self.country_ids(token))
+        return self.credentials(entry)
+
+    def country_ids(self, token):
+        return Profile.countries.through.objects.filter(
+            profile__user_id=token.user_id
+        ).values_list("country_id", flat=True)
+
+    def cache(self, key, token, country_ids):
+        entry = (token, token.user, tuple(country_ids))
+        token_cache.set(key, *entry)
+        return entry
+
+    def credentials(self, entry):
+        token, user, country_ids = entry
 
-        if not token.user.is_active:
+        if not user.is_active:
             raise AuthenticationFailed("User inactive or deleted")
 
-        return (token.user, token)
+        # Cached instances are shared between requests, hand out a copy
+        user = copy.copy(user)
+        user.country_ids = country_ids
+        return (user, token)
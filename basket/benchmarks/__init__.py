@@ -0,0 +1,732 @@
+"""Benchmarks run with ``manage.py benchmark <name>``.
+
+Each benchmark runs against a throwaway test database and returns a list of
+result rows (dicts) that the command prints as a table.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import random
+import resource
+import statistics
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    OperationalError,
+    connection,
+    connections,
+)
+from django.db.models import Q
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from basket import async_views
+from basket.assignment import assign_game
+from basket.benchmarks.fakeapi import FakeRapidAPI
+from basket.dates import day_range
+from basket.exceptions import ConflictException
+from basket.ingest import ingest_games
+from basket.jobs import claim_job, run_job
+from basket.models import Country, Game, Profile, RefreshJob
+from basket.serializers import FastGameSerializer, GameSerializer
+from basket.streaming import iter_response_items
+from basket.synthetic import synthetic_body, synthetic_games
+from basket.validators import ScoreValidator, StatusValidator, validate_games
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+@contextmanager
+def benchmark_database():
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    # Routed reads would otherwise hit the real replica; point it at the
+    # throwaway database, like TEST["MIRROR"] does in the tests. Threads
+    # build their connections from these same settings dicts.
+    mirrors = {}
+    for alias in connections:
+        if alias != DEFAULT_DB_ALIAS:
+            connections[alias].close()
+            mirrors[alias] = dict(connections.settings[alias])
+            connections.settings[alias].update(connection.settings_dict)
+    try:
+        # DEBUG keeps every executed query in memory
+        with override_settings(DEBUG=False):
+            yield
+    finally:
+        for alias, settings_dict in mirrors.items():
+            connections[alias].close()
+            connections.settings[alias].clear()
+            connections.settings[alias].update(settings_dict)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def _measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, time.perf_counter() - start, peak
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+@benchmark("ingest-memory")
+def ingest_memory(sizes=(1000, 10000, 50000), **options):
+    """Peak memory of buffered vs. streaming ingestion of a /games body"""
+    results = []
+    for size in sizes:
+        for mode in ("buffered", "streaming"):
+            with benchmark_database():
+
+                def run():
+                    body = synthetic_body(synthetic_games(size))
+                    if mode == "buffered":
+                        games = json.loads(b"".join(body))["response"]
+                    else:
+                        games = iter_response_items(body)
+                    return ingest_games(games)
+
+                report, elapsed, peak = _measure(run)
+            results.append(
+                {
+                    "games": size,
+                    "mode": mode,
+                    "inserted": report["game"]["inserted"],
+                    "seconds": round(elapsed, 2),
+                    "peak_mib": round(peak / 2**20, 1),
+                }
+            )
+    return results
+
+
+@benchmark("serializers")
+def serializers(sizes=(1000, 10000), **options):
+    """Rows/sec rendering game lists with GameSerializer vs. the fast path"""
+    results = []
+    for size in sizes:
+        with benchmark_database():
+            ingest_games(synthetic_games(size))
+            queryset = Game.objects.select_related(
+                "league", "country", "home_team", "away_team"
+            ).order_by("date", "id")
+            fast = FastGameSerializer()
+            modes = {
+                "GameSerializer": lambda: GameSerializer(
+                    queryset.all(), many=True
+                ).data,
+                "FastGameSerializer": lambda: list(
+                    fast.serialize(queryset.all())
+                ),
+            }
+            for mode, func in modes.items():
+                # Best of three to smooth out noise
+                elapsed = min(_timed(func) for _ in range(3))
+                results.append(
+                    {
+                        "games": size,
+                        "serializer": mode,
+                        "seconds": round(elapsed, 3),
+                        "rows_per_sec": int(size / elapsed),
+                    }
+                )
+    return results
+
+
+@benchmark("assign")
+def assign(sizes=(1000,), threads=8, **options):
+    """Assignments/sec with every thread racing for the same games"""
+    results = []
+    for size in sizes:
+        with benchmark_database():
+            ingest_games(synthetic_games(size))
+            game_ids = list(Game.objects.values_list("pk", flat=True))
+            countries = list(Country.objects.all())
+            users = []
+            for i in range(threads):
+                user = get_user_model().objects.create(username=f"user{i}")
+                Profile.objects.create(user=user).countries.set(countries)
+                users.append(user)
+
+            counts = {"assigned": 0, "conflicts": 0, "retries": 0}
+            lock = threading.Lock()
+            barrier = threading.Barrier(threads)
+
+            def race(user, seed):
+                ids = game_ids[:]
+                random.Random(seed).shuffle(ids)
+                barrier.wait()
+                try:
+                    for game_id in ids:
+                        outcome = _assign(game_id, user)
+                        with lock:
+                            for key, value in outcome.items():
+                                counts[key] += value
+                finally:
+                    connection.close()
+
+            workers = [
+                threading.Thread(target=race, args=(user, i))
+                for i, user in enumerate(users)
+            ]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+
+            holders = Game.objects.exclude(user=None).count()
+            results.append(
+                {
+                    "games": size,
+                    "threads": threads,
+                    **counts,
+                    "single_winner": holders == counts["assigned"] == size,
+                    "seconds": round(elapsed, 2),
+                    "assignments_per_sec": int(counts["assigned"] / elapsed),
+                    "attempts_per_sec": int(size * threads / elapsed),
+                }
+            )
+    return results
+
+
+def _assign(game_id, user):
+    retries = 0
+    while True:
+        try:
+            assign_game(game_id, user)
+        except OperationalError:
+            # In-memory SQLite reports a locked table instead of waiting
+            if connection.vendor != "sqlite":
+                raise
+            retries += 1
+        except ConflictException:
+            return {"conflicts": 1, "retries": retries}
+        else:
+            return {"assigned": 1, "retries": retries}
+
+
+def _index_used(queryset):
+    """Name of the first index in the query plan, if any"""
+    plan = queryset.explain()
+    for word in plan.replace("(", " ").split():
+        if word.endswith("_idx") or word.endswith('_idx"'):
+            return word.strip('"')
+    return "-"
+
+
+@benchmark("queries")
+def queries(sizes=(10000, 100000), **options):
+    """Time and index used by the hot list queries (first page of 100)"""
+    results = []
+    for size in sizes:
+        with benchmark_database():
+            ingest_games(synthetic_games(size))
+            user = get_user_model().objects.create(username="operator")
+            # A tenth of the games is assigned, spread over all countries
+            Game.objects.filter(pk__lte=size // 10).update(user=user)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            countries = [1, 2, 3]
+            start, end = day_range("2023-01-02")
+            cases = {
+                "visible": Game.objects.filter(country__in=countries).filter(
+                    Q(user=None) | Q(user=user)
+                ),
+                "unassigned": Game.objects.filter(
+                    country__in=countries, user=None
+                ),
+                "assigned": Game.objects.filter(user=user),
+                "league": Game.objects.filter(league=3),
+                "season": Game.objects.filter(league__season="2022-2023"),
+                "date": Game.objects.filter(date__gte=start, date__lt=end),
+            }
+            for name, queryset in cases.items():
+                page = queryset.order_by("date", "id")[:100]
+                elapsed = min(
+                    _timed(lambda: list(page.all())) for _ in range(5)
+                )
+                results.append(
+                    {
+                        "games": size,
+                        "query": name,
+                        "index": _index_used(page),
+                        "ms": round(elapsed * 1000, 2),
+                    }
+                )
+    return results
+
+
+def _per_value_validation(games):
+    """What model validation does: one validator call per JSON value"""
+    status, score = StatusValidator(), ScoreValidator()
+    rejected = 0
+    for game in games:
+        try:
+            status(game["status"])
+            score(game["scores"]["home"])
+            score(game["scores"]["away"])
+        except ValidationError:
+            rejected += 1
+    return rejected
+
+
+@benchmark("validation")
+def validation(sizes=(100000,), **options):
+    """Games/sec validated per value vs. by the batch validator"""
+    results = []
+    for size in sizes:
+        games = list(synthetic_games(size))
+        # Break 1% of the payloads
+        for game in games[::100]:
+            game["scores"]["home"]["total"] = "N/A"
+        modes = {
+            "per-value": lambda: _per_value_validation(games),
+            "batch": lambda: len(validate_games(games)[1]),
+        }
+        for mode, func in modes.items():
+            rejected = func()
+            elapsed = min(_timed(func) for _ in range(3))
+            results.append(
+                {
+                    "games": size,
+                    "mode": mode,
+                    "rejected": rejected,
+                    "seconds": round(elapsed, 3),
+                    "games_per_sec": int(size / elapsed),
+                }
+            )
+    return results
+
+
+def _seed_users(count, countries, seed=0):
+    """Create ``count`` users with 1-5 random countries each.
+
+    Returns ``(token key, country ids)`` pairs.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    users = User.objects.bulk_create(
+        [User(username=f"user{i}") for i in range(count)]
+    )
+    profiles = Profile.objects.bulk_create(
+        [Profile(user=user) for user in users]
+    )
+    country_sets = [
+        rng.sample(countries, rng.randint(1, min(5, len(countries))))
+        for _ in users
+    ]
+    Profile.countries.through.objects.bulk_create(
+        [
+            Profile.countries.through(profile=profile, country_id=country_id)
+            for profile, country_ids in zip(profiles, country_sets)
+            for country_id in country_ids
+        ]
+    )
+    tokens = Token.objects.bulk_create(
+        [Token(key=Token.generate_key(), user=user) for user in users]
+    )
+    return [
+        (token.key, country_ids)
+        for token, country_ids in zip(tokens, country_sets)
+    ]
+
+
+def _work_off_jobs(worker):
+    while job := claim_job(worker):
+        run_job(job)
+
+
+def _peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _load(clients, requests, send):
+    """Call ``send(client, i)`` ``requests`` times from ``clients`` threads.
+
+    Each thread has its own test client and database connection. Returns
+    latency percentiles, queries per request and error counts.
+    """
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, queries, statuses = [], [], defaultdict(int)
+
+    def run():
+        client = Client(raise_request_exception=False)
+        try:
+            while (i := next(counter)) < requests:
+                with CaptureQueriesContext(connection) as ctx:
+                    start = time.perf_counter()
+                    status = send(client, i)
+                    elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    queries.append(len(ctx))
+                    statuses[status] += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run) for _ in range(clients)]
+    start = time.perf_counter()
+    with _quiet_request_log():
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": sum(n for code, n in statuses.items() if code >= 500),
+        "rejected": sum(n for code, n in statuses.items() if 400 <= code < 500),
+        "rps": int(len(latencies) / elapsed),
+        **_percentiles(latencies),
+        "queries": round(statistics.mean(queries), 1),
+        "peak_rss_mib": _peak_rss_mib(),
+    }
+
+
+@contextmanager
+def _quiet_request_log():
+    # Server errors are counted by the benchmarks instead of logged one by one
+    logger = logging.getLogger("django.request")
+    level = logger.level
+    logger.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+def _percentiles(latencies, prefix=""):
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        f"{prefix}p{n}_ms": round(cuts[n - 1] * 1000, 1) for n in (50, 95, 99)
+    }
+
+
+API_SCENARIOS = (
+    "list",
+    "detail",
+    "assigned",
+    "unassigned",
+    "assign",
+    "refresh",
+)
+
+
+@benchmark("api")
+def api(
+    sizes=(200000,),
+    teams=5000,
+    users=2000,
+    clients=8,
+    requests=400,
+    scenarios=API_SCENARIOS,
+    **options,
+):
+    """Latency, queries and memory of the API under concurrent clients.
+
+    Every client authenticates as a random synthetic user. ``rejected``
+    counts 4xx responses, which are expected for some assignments (409)
+    and detail requests for games assigned in the meantime (404). Refreshes
+    fetch a new day from a local ``FakeRapidAPI`` and run the queued job
+    in the requesting thread, like a worker would. On in-memory SQLite,
+    concurrent assignments can fail with "table is locked", which shows up
+    as ``errors``.
+    """
+    results = []
+    for size in sizes:
+        with benchmark_database(), override_settings(
+            ALLOWED_HOSTS=["testserver"]
+        ):
+            ingest_games(synthetic_games(size, teams=teams))
+            countries = list(Country.objects.values_list("pk", flat=True))
+            accounts = _seed_users(users, countries)
+            admin = get_user_model().objects.create(
+                username="admin", is_staff=True
+            )
+            admin_token = Token.objects.create(user=admin).key
+            games_by_country = defaultdict(list)
+            for pk, country_id in Game.objects.values_list("pk", "country"):
+                games_by_country[country_id].append(pk)
+            rng = random.Random(0)
+            first_day = date(2030, 1, 1)
+            # In-memory SQLite fails concurrent write transactions instead
+            # of waiting, so refreshes take turns there
+            refreshing = (
+                threading.Lock()
+                if connection.vendor == "sqlite"
+                else nullcontext()
+            )
+
+            def auth(key):
+                return {"HTTP_AUTHORIZATION": f"Bearer {key}"}
+
+            def visible_game(country_ids):
+                return rng.choice(games_by_country[rng.choice(country_ids)])
+
+            def send(scenario, client, i):
+                key, country_ids = accounts[i % len(accounts)]
+                if scenario == "list":
+                    response = client.get("/games/", **auth(key))
+                elif scenario == "detail":
+                    game = visible_game(country_ids)
+                    response = client.get(f"/games/{game}/", **auth(key))
+                elif scenario in ("assigned", "unassigned"):
+                    response = client.get(f"/games/{scenario}/", **auth(key))
+                elif scenario == "assign":
+                    game = visible_game(country_ids)
+                    response = client.patch(
+                        f"/games/{game}/assign/", **auth(key)
+                    )
+                else:
+                    day = first_day + timedelta(days=i)
+                    with refreshing:
+                        response = client.get(
+                            "/games/",
+                            {"refresh": "true", "date": day.isoformat()},
+                            **auth(admin_token),
+                        )
+                        _work_off_jobs(f"benchmark:{i}")
+                return response.status_code
+
+            with FakeRapidAPI(teams=teams):
+                for scenario in scenarios:
+                    stats = _load(
+                        clients,
+                        requests,
+                        lambda client, i: send(scenario, client, i),
+                    )
+                    results.append(
+                        {
+                            "games": size,
+                            "scenario": scenario,
+                            "clients": clients,
+                            **stats,
+                        }
+                    )
+    return results
+
+
+@benchmark("metrics")
+def metrics_overhead(sizes=(10000,), requests=500, **options):
+    """Cost of ``METRICS_ENABLED`` on uncached game list requests.
+
+    Requests alternate between a client with the metrics middleware and one
+    without, so both see the same machine load.
+    """
+    results = []
+    for size in sizes:
+        with benchmark_database(), override_settings(
+            ALLOWED_HOSTS=["testserver"], GAMES_CACHE_TIMEOUT=0
+        ):
+            ingest_games(synthetic_games(size))
+            admin = get_user_model().objects.create(
+                username="admin", is_staff=True
+            )
+            headers = {
+                "HTTP_AUTHORIZATION": f"Bearer {Token.objects.create(user=admin)}"
+            }
+            clients = {}
+            for enabled in (False, True):
+                # The middleware is set up on the client's first request
+                with override_settings(METRICS_ENABLED=enabled):
+                    clients[enabled] = Client()
+                    clients[enabled].get("/games/", **headers)
+            seconds = dict.fromkeys(clients, 0.0)
+            for _ in range(requests):
+                for enabled, client in clients.items():
+                    seconds[enabled] += _timed(
+                        lambda: client.get("/games/", **headers)
+                    )
+            results.append(
+                {
+                    "games": size,
+                    "requests": requests,
+                    "disabled_ms": round(seconds[False] / requests * 1000, 2),
+                    "enabled_ms": round(seconds[True] / requests * 1000, 2),
+                    "overhead": f"{seconds[True] / seconds[False] - 1:.1%}",
+                }
+            )
+    return results
+
+
+@benchmark("asgi")
+def asgi(
+    sizes=(20000,),
+    users=200,
+    clients=32,
+    requests=1000,
+    refresh_every=20,
+    upstream_delay=0.2,
+    **options,
+):
+    """Game reads per second under WSGI vs. ASGI while refreshes run.
+
+    Requests alternate between game lists and details, and every
+    ``refresh_every``-th one is an admin refresh of a new 3-day range,
+    answered by a ``FakeRapidAPI`` taking ``upstream_delay`` seconds per
+    day. Under WSGI, ``clients`` threads each run the refreshes they asked
+    for, like a sync deployment where the RapidAPI round trips hold a
+    thread. Under ASGI, ``clients`` tasks share one event loop and call the
+    ``/async/`` endpoints, and refreshes run in the background of the same
+    loop. ``drain_s`` is the time left to finish them after the last
+    response. On in-memory SQLite, reads that hit a table being written
+    fail with "table is locked" and show up as ``errors``.
+    """
+    results = []
+    for size in sizes:
+        with benchmark_database(), override_settings(
+            ALLOWED_HOSTS=["testserver"]
+        ):
+            ingest_games(synthetic_games(size))
+            countries = list(Country.objects.values_list("pk", flat=True))
+            accounts = _seed_users(users, countries)
+            admin = get_user_model().objects.create(
+                username="admin", is_staff=True
+            )
+            admin_token = Token.objects.create(user=admin).key
+            games_by_country = defaultdict(list)
+            for pk, country_id in Game.objects.values_list("pk", "country"):
+                games_by_country[country_id].append(pk)
+            first_day = date(2030, 1, 1)
+
+            def plan(i, rng):
+                """``(kind, path, data, token)`` of the ``i``-th request"""
+                if i % refresh_every == refresh_every - 1:
+                    day = first_day + timedelta(days=3 * i)
+                    data = {
+                        "refresh": "true",
+                        "date_from": day.isoformat(),
+                        "date_to": (day + timedelta(days=2)).isoformat(),
+                    }
+                    return "refresh", "/games/", data, admin_token
+                key, country_ids = accounts[i % len(accounts)]
+                if i % 2:
+                    game = rng.choice(games_by_country[rng.choice(country_ids)])
+                    return "read", f"/games/{game}/", {}, key
+                return "read", "/games/", {}, key
+
+            with FakeRapidAPI(delay=upstream_delay), _quiet_request_log():
+                for mode, run in (("wsgi", _wsgi_mix), ("asgi", _asgi_mix)):
+                    failed = RefreshJob.objects.filter(
+                        status=RefreshJob.Status.FAILED
+                    )
+                    failed_before = failed.count()
+                    samples, elapsed, drain = run(clients, requests, plan)
+                    reads = [
+                        seconds
+                        for kind, _, seconds in samples
+                        if kind == "read"
+                    ]
+                    results.append(
+                        {
+                            "games": size,
+                            "mode": mode,
+                            "clients": clients,
+                            "requests": len(samples),
+                            "refreshes": len(samples) - len(reads),
+                            "errors": sum(
+                                1 for _, code, _ in samples if code >= 500
+                            ),
+                            "failed_refreshes": failed.count() - failed_before,
+                            "rps": int(len(samples) / elapsed),
+                            **_percentiles(reads, prefix="read_"),
+                            "drain_s": round(drain, 2),
+                            "peak_rss_mib": _peak_rss_mib(),
+                        }
+                    )
+    return results
+
+
+def _wsgi_mix(clients, requests, plan):
+    counter = itertools.count()
+    samples = []
+
+    def run(seed):
+        client = Client(raise_request_exception=False)
+        rng = random.Random(seed)
+        try:
+            while (i := next(counter)) < requests:
+                kind, path, data, key = plan(i, rng)
+                start = time.perf_counter()
+                response = client.get(
+                    path, data, HTTP_AUTHORIZATION=f"Bearer {key}"
+                )
+                code = response.status_code
+                if kind == "refresh":
+                    try:
+                        _work_off_jobs(f"wsgi:{i}")
+                    except OperationalError:
+                        # In-memory SQLite reports a locked table instead of
+                        # waiting
+                        if connection.vendor != "sqlite":
+                            raise
+                        code = 500
+                seconds = time.perf_counter() - start
+                samples.append((kind, code, seconds))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start, 0.0
+
+
+def _asgi_mix(clients, requests, plan):
+    async def main():
+        counter = itertools.count()
+        samples = []
+        client = AsyncClient(raise_request_exception=False)
+
+        async def run(seed):
+            rng = random.Random(seed)
+            while (i := next(counter)) < requests:
+                kind, path, data, key = plan(i, rng)
+                start = time.perf_counter()
+                response = await client.get(
+                    f"/async{path}", data, AUTHORIZATION=f"Bearer {key}"
+                )
+                seconds = time.perf_counter() - start
+                samples.append((kind, response.status_code, seconds))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run(n) for n in range(clients)))
+        elapsed = time.perf_counter() - start
+        await asyncio.gather(*async_views.background_tasks)
+        return samples, elapsed, time.perf_counter() - start - elapsed
+
+    return async_to_sync(main)()
@@ -0,0 +1,109 @@
+"""Local HTTP servers standing in for API-BASKETBALL's /games endpoint.
+
+Used by the benchmarks (``manage.py benchmark api``) and by the tests so
+that refreshes never reach RapidAPI.
+"""
+import json
+import threading
+import time
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import override_settings
+
+from basket.synthetic import synthetic_body, synthetic_games
+
+
+class FakeUpstream:
+    """Serve ``settings.GAMES_ENDPOINT`` from a local server.
+
+    Subclasses override ``reply(path, query)`` to return a
+    ``(status, headers, body)`` tuple, where body is JSON-serializable or
+    bytes; by default every request gets RapidAPI's 404. Inside the
+    ``with`` block, ``GAMES_ENDPOINT`` points at the server and
+    ``settings`` are overridden.
+    """
+
+    def __init__(self, **settings):
+        self.requests = []
+        self.connections = 0
+        self.overrides = {"RAPID_API_KEY": "secret", **settings}
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                fake.connections += 1
+
+            def do_GET(self):
+                fake.requests.append((self.path, dict(self.headers)))
+                query = parse_qs(urlsplit(self.path).query)
+                code, headers, body = fake.reply(self.path, query)
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+                self.send_response(code)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+    def reply(self, path, query):
+        path = urlsplit(path).path
+        return 404, {}, {"message": f"Endpoint '{path}' does not exist"}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/games"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.settings = override_settings(
+            GAMES_ENDPOINT=self.url, **self.overrides
+        )
+        self.settings.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.settings.disable()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeRapidAPI(FakeUpstream):
+    """Answer ``/games?date=YYYY-MM-DD`` with synthetic games of that day.
+
+    Every day gets ``games_per_day`` games whose ids do not overlap with
+    other days, so each refresh of a new day inserts new rows. Replies are
+    sent after ``delay`` seconds, to stand in for RapidAPI's latency.
+    """
+
+    def __init__(self, games_per_day=48, delay=0.0, **kwargs):
+        super().__init__()
+        self.games_per_day = games_per_day
+        self.delay = delay
+        self.kwargs = kwargs
+
+    def reply(self, path, query):
+        time.sleep(self.delay)
+        try:
+            day = date.fromisoformat(query["date"][0])
+        except (KeyError, ValueError):
+            return 200, {}, {"errors": {"date": "Required."}, "response": []}
+        start = datetime.combine(day, datetime.min.time(), timezone.utc)
+        games = synthetic_games(
+            self.games_per_day,
+            start=start,
+            first_id=day.toordinal() * self.games_per_day,
+            seed=day.toordinal(),
+            **self.kwargs,
+        )
+        return 200, {}, b"".join(synthetic_body(games))
@@ -0,0 +1,120 @@
+"""Response cache for the game lists.
+
+A non-admin user's game list only depends on their countries and on the
+games assigned to them. Users with the same countries and no assigned games
+therefore share a visibility scope, and cached responses are shared across
+that scope. Entries are keyed on version stamps (one per country, plus one
+for data shared by all countries) that are bumped whenever the underlying
+games change, so stale entries are simply never looked up again.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from basket.models import Game, Profile
+
+ALL_VERSION_KEY = "games:version:all"
+ANY_VERSION_KEY = "games:version:any"
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+    total = result["hits"] + result["misses"]
+    result["hit_rate"] = result["hits"] / total if total else 0.0
+    return result
+
+
+def _country_version_key(country_id):
+    return f"games:version:country:{country_id}"
+
+
+def _scope_key(user_id):
+    return f"games:scope:user:{user_id}"
+
+
+def _bump(keys):
+    stamp = time.time_ns()
+    cache.set_many({key: stamp for key in keys}, None)
+
+
+def invalidate_countries(country_ids):
+    """Expire cached lists containing games from ``country_ids``"""
+    _bump([ANY_VERSION_KEY, *(_country_version_key(pk) for pk in country_ids)])
+
+
+def invalidate_all():
+    """Expire every cached list, e.g. after a team or league changed"""
+    _bump([ANY_VERSION_KEY, ALL_VERSION_KEY])
+
+
+def invalidate_user(user_id):
+    """Forget a user's visibility scope after their countries or
+    assignments changed"""
+    cache.delete(_scope_key(user_id))
+
+
+def get_scope(user):
+    """Return ``(label, version_keys)`` describing what ``user`` can see"""
+    if user.is_staff:
+        return "admin", [ANY_VERSION_KEY]
+    key = _scope_key(user.pk)
+    scope = cache.get(key)
+    if scope is None:
+        # Set by BearerTokenAuthentication from its token cache
+        country_ids = getattr(user, "country_ids", None)
+        if country_ids is None:
+            country_ids = Profile.countries.through.objects.filter(
+                profile__user=user
+            ).values_list("country_id", flat=True)
+        country_ids = sorted(country_ids)
+        has_assigned = Game.objects.filter(user=user).exists()
+        scope = (country_ids, has_assigned)
+        cache.set(key, scope, settings.GAMES_CACHE_TIMEOUT)
+    country_ids, has_assigned = scope
+    label = "countries:" + ",".join(map(str, country_ids))
+    if has_assigned:
+        # Lists include the user's own games, so they can't be shared
+        label += f":user:{user.pk}"
+    version_keys = [
+        ALL_VERSION_KEY,
+        *(_country_version_key(pk) for pk in country_ids),
+    ]
+    return label, version_keys
+
+
+def _versions(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        stamp = time.time_ns()
+        cache.set_many({key: stamp for key in missing}, None)
+        versions.update({key: stamp for key in missing})
+    return [str(versions[key]) for key in keys]
+
+
+def response_key(request, action):
+    label, version_keys = get_scope(request.user)
+    raw = "|".join(
+        [action, label, *_versions(version_keys), request.build_absolute_uri()]
+    )
+    return "games:page:" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def get(key):
+    data = cache.get(key)
+    with _lock:
+        _stats["hits" if data is not None else "misses"] += 1
+    return data
+
+
+def set(key, data, timeout=None):
+    if timeout is None:
+        timeout = settings.GAMES_CACHE_TIMEOUT
+    cache.set(key, data, timeout)
@@ -0,0 +1,42 @@
+"""Conditional GET validators for the game endpoints.
+
+Validators are computed with a single aggregate query over the filtered
+result set, so an unchanged resource can be answered with 304 Not Modified
+without loading or serializing any rows.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import quote_etag
+
+# Changes to any of these show up in a serialized game
+TIMESTAMP_FIELDS = (
+    "updated_at",
+    "league__updated_at",
+    "country__updated_at",
+    "home_team__updated_at",
+    "away_team__updated_at",
+)
+
+
+def validators(queryset, *parts):
+    """Return ``(etag, last_modified)`` for ``queryset``.
+
+    ``parts`` are extra strings that the representation depends on, such as
+    the user's visibility scope and the requested format.
+    """
+    aggregates = {
+        f"max_{i}": Max(field) for i, field in enumerate(TIMESTAMP_FIELDS)
+    }
+    result = queryset.order_by().aggregate(count=Count("pk"), **aggregates)
+    timestamps = [result[name] for name in aggregates if result[name]]
+    last_modified = max(timestamps) if timestamps else None
+    raw = "|".join(
+        [
+            *parts,
+            str(result["count"]),
+            *(timestamp.isoformat() for timestamp in timestamps),
+        ]
+    )
+    etag = quote_etag(hashlib.sha256(raw.encode()).hexdigest()[:32])
+    return etag, last_modified
@@ -0,0 +1,34 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from basket.exceptions import BadRequestException
+
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD querystring value"""
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise BadRequestException(f"Invalid date: {value}")
+    return day
+
+
+def day_range(value):
+    """Return the [start, end) datetimes of a YYYY-MM-DD day"""
+    start = timezone.make_aware(datetime.combine(parse_day(value), time.min))
+    return start, start + timedelta(days=1)
+
+
+def days(date_from, date_to, limit=None):
+    """Every day from ``date_from`` to ``date_to`` (inclusive), as strings"""
+    first, last = parse_day(date_from), parse_day(date_to)
+    if last < first:
+        raise BadRequestException("date_to is before date_from")
+    count = (last - first).days + 1
+    if limit is not None and count > limit:
+        raise BadRequestException(f"Date ranges are limited to {limit} days")
+    return [(first + timedelta(days=i)).isoformat() for i in range(count)]
@@ -0,0 +1,66 @@
+"""Django's PostgreSQL backend with connections kept in a ``ConnectionPool``.
+
+Use with ``CONN_MAX_AGE = 0``: connections go back to the pool at the end
+of every request instead of being closed. Size the pool with the ``POOL``
+key of the database settings (``MAX_SIZE``, ``TIMEOUT``, ``CHECK_AFTER``).
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from basket.db.pool import PoolTimeout, get_pool
+
+Database = base.Database
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        try:
+            connection = self.pool.acquire(
+                lambda: connect(conn_params), self._ping
+            )
+        except PoolTimeout as e:
+            raise Database.OperationalError(str(e)) from e
+        # Set by the parent class on new connections only
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            # Closed inside atomic(), the wrapper keeps its connection
+            if not self.in_atomic_block and self._reset(self.connection):
+                self.pool.release(self.connection)
+            else:
+                self.pool.discard(self.connection)
+
+    def _reset(self, connection):
+        """Roll back any open transaction, returning whether the connection
+        can be reused"""
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            connection.rollback()
+        except Database.Error:
+            return False
+        return True
+
+    def _ping(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Database.Error:
+            return False
+        return True
@@ -0,0 +1,193 @@
+"""In-process database connection pool.
+
+Django opens one connection per thread and, with ``CONN_MAX_AGE = 0``,
+closes it at the end of every request. ``basket.db.backends.postgresql``
+hands those connections back to a ``ConnectionPool`` instead, so requests
+reuse warm connections and each worker process keeps at most
+``POOL["MAX_SIZE"]`` of them open however many threads it runs.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections shared by a process's threads.
+
+    At most ``max_size`` connections are open at once. ``acquire()`` waits
+    up to ``timeout`` seconds for one to be released, then raises
+    ``PoolTimeout``. Connections idle for more than ``check_after`` seconds
+    are health checked before being handed out, and broken ones are
+    replaced.
+    """
+
+    def __init__(self, max_size, timeout=10.0, check_after=30.0):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.pid = os.getpid()
+        # Most recently released last, so idle connections age out
+        self._idle = []
+        self._open = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "discarded": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+
+    def acquire(self, connect, check):
+        """Return an idle connection, or one made with ``connect()``.
+
+        ``check(connection)`` returns whether a connection that sat idle
+        for a while still works.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection, released_at = self._checkout(deadline)
+            if connection is None:
+                try:
+                    connection = connect()
+                except BaseException:
+                    self._forget()
+                    raise
+                self._count("created")
+                return connection
+            idle = time.monotonic() - released_at
+            if idle < self.check_after or check(connection):
+                self._count("reused")
+                return connection
+            self.discard(connection)
+
+    def _checkout(self, deadline):
+        """Pop an idle ``(connection, released_at)`` or reserve a slot for a
+        new connection, returned as ``(None, None)``"""
+        with self._condition:
+            waited = False
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._open < self.max_size:
+                    self._open += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No database connection released within "
+                        f"{self.timeout}s (pool size {self.max_size})."
+                    )
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                self._condition.wait(remaining)
+
+    def release(self, connection):
+        """Return a connection in a clean state for reuse"""
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a broken connection and free its slot"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._count("discarded")
+        self._forget()
+
+    def _forget(self):
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    def _count(self, stat):
+        with self._condition:
+            self._stats[stat] += 1
+
+    def stats(self):
+        with self._condition:
+            return dict(
+                self._stats,
+                open=self._open,
+                idle=len(self._idle),
+                max_size=self.max_size,
+            )
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """Return the pool of database ``alias``, creating a new one after a
+    fork. Connections inherited from the parent are left alone, closing
+    them would end the parent's sessions."""
+    options = settings_dict.get("POOL", {})
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[alias] = ConnectionPool(
+                max_size=options.get("MAX_SIZE", 4),
+                timeout=options.get("TIMEOUT", 10.0),
+                check_after=options.get("CHECK_AFTER", 30.0),
+            )
+        return pool
+
+
+def log_sizing(workers, threads, alias=DEFAULT_DB_ALIAS):
+    """Log how many connections the server may open against what the
+    database accepts, warning about settings that cannot work well.
+
+    Called by gunicorn as each worker starts (see ``gunicorn.conf.py``).
+    """
+    connection = connections[alias]
+    settings_dict = connection.settings_dict
+    pooled = hasattr(connection, "pool")
+    per_worker = settings_dict["POOL"]["MAX_SIZE"] if pooled else threads
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW max_connections")
+            max_connections = int(cursor.fetchone()[0])
+    except Exception:
+        logger.exception("Could not read max_connections")
+        max_connections = None
+    finally:
+        connection.close()
+
+    logger.info(
+        "%d workers x %d threads, %s connections per worker (%s), "
+        "at most %d in total; the database accepts %s",
+        workers,
+        threads,
+        per_worker,
+        "pooled" if pooled else f"CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}",
+        workers * per_worker,
+        max_connections,
+    )
+    if pooled and threads > per_worker:
+        logger.warning(
+            "More threads (%d) than pooled connections (%d): requests may "
+            "wait up to %ss for a connection",
+            threads,
+            per_worker,
+            connection.pool.timeout,
+        )
+    if max_connections and workers * per_worker > max_connections:
+        logger.warning(
+            "Workers may open %d connections, more than max_connections=%d",
+            workers * per_worker,
+            max_connections,
+        )
@@ -4,3 +4,13 @@ from rest_framework.exceptions import APIException
 
 class BadRequestException(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
+
+
+class ConflictException(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The game is already assigned to another user."
+
+
+class UpstreamException(APIException):
+    status_code = status.HTTP_502_BAD_GATEWAY
+    default_detail = "API-BASKETBALL request failed."
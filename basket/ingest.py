@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import json
+from collections import defaultdict
+from itertools import chain, islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from basket import cache, standings
+from basket.dates import days
+from basket.models import (
+    Country,
+    Game,
+    League,
+    QuarantinedGame,
+    Team,
+    score_columns,
+)
+from basket.upstream import get_async_client, get_client
+from basket.validators import validate_games
+
+BATCH_SIZE = 500
+
+# Querystring options API-BASKETBALL's /games understands
+UPSTREAM_OPTIONS = ("date", "league", "season", "team")
+
+LEAGUE_FIELDS = ("name", "type", "season", "logo")
+COUNTRY_FIELDS = ("name", "code", "flag")
+TEAM_FIELDS = ("name", "logo")
+GAME_FIELDS = (
+    "date",
+    "time",
+    "timestamp",
+    "timezone",
+    "stage",
+    "week",
+    "league_id",
+    "country_id",
+    "status",
+    "home_team_id",
+    "away_team_id",
+    "home_score",
+    "away_score",
+    *score_columns(None, None),
+)
+
+
+def _game_values(game_dict):
+    return {
+        "date": game_dict["date"],
+        "time": game_dict["time"],
+        "timestamp": game_dict["timestamp"],
+        "timezone": game_dict["timezone"],
+        "stage": game_dict.get("stage"),
+        "week": game_dict.get("week"),
+        "league_id": game_dict["league"]["id"],
+        "country_id": game_dict["country"]["id"],
+        "status": game_dict["status"],
+        "home_team_id": game_dict["teams"]["home"]["id"],
+        "away_team_id": game_dict["teams"]["away"]["id"],
+        "home_score": game_dict["scores"]["home"],
+        "away_score": game_dict["scores"]["away"],
+        **score_columns(
+            game_dict["scores"]["home"], game_dict["scores"]["away"]
+        ),
+    }
+
+
+def _clean(model, data, fields):
+    """Coerce upstream values the same way ``Model.save()`` would"""
+    values = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        value = data.get(name)
+        if value is None and field.empty_strings_allowed and not field.null:
+            value = ""
+        else:
+            value = field.to_python(value)
+        values[name] = value
+    return values
+
+
+def fingerprint(data):
+    """Stable hash of an upstream payload fragment"""
+    encoded = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _upsert(model, rows, fields, batch_size, on_write=None):
+    """Insert or update ``rows`` (a dict of pk -> upstream values) in bulk.
+
+    Rows whose stored fingerprint matches the payload are skipped without
+    loading them. Changed rows are loaded and only the columns that actually
+    moved are written. ``on_write(previous, obj)`` is called for every
+    inserted or changed row, with the previous values of the moved columns.
+    """
+    fingerprints = {pk: fingerprint(data) for pk, data in rows.items()}
+    stored = dict(
+        model.objects.filter(pk__in=list(rows)).values_list("pk", "fingerprint")
+    )
+    stale = [pk for pk in stored if stored[pk] != fingerprints[pk]]
+    existing = model.objects.in_bulk(stale) if stale else {}
+    now = timezone.now()
+    to_create = []
+    to_update = defaultdict(list)
+    changed = 0
+    for pk, data in rows.items():
+        if pk in stored and pk not in existing:
+            continue
+        values = _clean(model, data, fields)
+        obj = existing.get(pk)
+        if obj is None:
+            obj = model(pk=pk, fingerprint=fingerprints[pk], **values)
+            to_create.append(obj)
+            if on_write:
+                on_write({}, obj)
+            continue
+        previous = {
+            name: getattr(obj, name)
+            for name, value in values.items()
+            if getattr(obj, name) != value
+        }
+        for name in previous:
+            setattr(obj, name, values[name])
+        obj.fingerprint = fingerprints[pk]
+        if previous:
+            obj.updated_at = now
+            changed += 1
+            if on_write:
+                on_write(previous, obj)
+        to_update[tuple(previous)].append(obj)
+
+    if to_create:
+        model.objects.bulk_create(to_create, batch_size=batch_size)
+    for moved, objs in to_update.items():
+        # Rows with no moved columns only get their fingerprint backfilled
+        update_fields = [*moved, "updated_at"] if moved else []
+        model.objects.bulk_update(
+            objs, [*update_fields, "fingerprint"], batch_size=batch_size
+        )
+    return {
+        "inserted": len(to_create),
+        "changed": changed,
+        "skipped": len(stored) - changed,
+    }
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def ingest_games(games, batch_size=BATCH_SIZE):
+    """Store API-BASKETBALL game dicts using set-based queries.
+
+    ``games`` may be any iterable, including a stream parsed on the fly. It
+    is consumed in batches of ``batch_size`` games so memory use does not
+    depend on the size of the payload. Leagues, countries and teams are
+    deduplicated and written at most once per call, so each batch costs one
+    lookup plus at most one insert and one update per model. Everything is
+    written in a single transaction. Rows that did not change upstream are
+    skipped (see ``_upsert``), and standings are refreshed only for the
+    teams of games that were written. Games failing ``validate_games`` are
+    quarantined and the rest of their batch proceeds. Returns
+    inserted/changed/skipped counts per model and the quarantined count.
+    """
+    models = {
+        "league": (League, LEAGUE_FIELDS),
+        "country": (Country, COUNTRY_FIELDS),
+        "team": (Team, TEAM_FIELDS),
+        "game": (Game, GAME_FIELDS),
+    }
+    report = {
+        name: {"inserted": 0, "changed": 0, "skipped": 0} for name in models
+    }
+    report["quarantined"] = 0
+    seen = {name: set() for name in models}
+    touched_countries = set()
+    standing_pairs = set()
+
+    def game_written(previous, game):
+        touched_countries.add(game.country_id)
+        if "country_id" in previous:
+            touched_countries.add(previous["country_id"])
+        if not previous or standings.GAME_FIELDS.intersection(previous):
+            standing_pairs.update(standings.game_pairs(game, previous))
+
+    with transaction.atomic():
+        for batch in _batches(games, batch_size):
+            batch, rejected = validate_games(batch)
+            if rejected:
+                quarantine(rejected)
+                report["quarantined"] += len(rejected)
+            rows = {name: {} for name in models}
+            for game_dict in batch:
+                rows["league"][game_dict["league"]["id"]] = game_dict["league"]
+                rows["country"][game_dict["country"]["id"]] = game_dict[
+                    "country"
+                ]
+                for side in ("home", "away"):
+                    team = game_dict["teams"][side]
+                    rows["team"][team["id"]] = team
+                rows["game"][game_dict["id"]] = _game_values(game_dict)
+
+            for name, (model, fields) in models.items():
+                new_rows = {
+                    pk: data
+                    for pk, data in rows[name].items()
+                    if pk not in seen[name]
+                }
+                if not new_rows:
+                    continue
+                counts = _upsert(
+                    model,
+                    new_rows,
+                    fields,
+                    batch_size,
+                    on_write=game_written if model is Game else None,
+                )
+                for key, value in counts.items():
+                    report[name][key] += value
+                if model is not Game:
+                    seen[name].update(new_rows)
+
+        standings.refresh(standing_pairs)
+        nested_changed = any(
+            report[name]["changed"] for name in ("league", "country", "team")
+        )
+        transaction.on_commit(
+            lambda: _invalidate_cache(touched_countries, nested_changed)
+        )
+    return report
+
+
+def quarantine(rejected):
+    """Store ``(game, errors)`` pairs for review instead of ingesting them.
+
+    A game already quarantined under the same upstream id is updated with
+    the latest payload and errors, so repeated refreshes don't pile up
+    copies of it.
+    """
+    by_id = {}
+    without_id = []
+    for game, errors in rejected:
+        game_id = game.get("id") if isinstance(game, dict) else None
+        obj = QuarantinedGame(
+            game_id=game_id if type(game_id) is int else None,
+            payload=game,
+            errors=errors,
+        )
+        if obj.game_id is None:
+            without_id.append(obj)
+        else:
+            by_id[obj.game_id] = obj
+    QuarantinedGame.objects.bulk_create(
+        by_id.values(),
+        update_conflicts=True,
+        unique_fields=["game_id"],
+        update_fields=["payload", "errors"],
+    )
+    QuarantinedGame.objects.bulk_create(without_id)
+
+
+def _invalidate_cache(country_ids, nested_changed):
+    if nested_changed:
+        cache.invalidate_all()
+    elif country_ids:
+        cache.invalidate_countries(country_ids)
+
+
+def upstream_queries(querystring):
+    """Split a refresh querystring into API-BASKETBALL /games queries.
+
+    ``date_from``/``date_to`` become one query per day, at most
+    ``REFRESH_MAX_DAYS`` of them. Local-only options are dropped.
+    """
+    query = {
+        option: value
+        for option, value in querystring.items()
+        if option in UPSTREAM_OPTIONS
+    }
+    date_from = querystring.get("date_from")
+    date_to = querystring.get("date_to")
+    if not (date_from or date_to):
+        return [query]
+    return [
+        {**query, "date": day}
+        for day in days(
+            date_from or date_to,
+            date_to or date_from,
+            limit=settings.REFRESH_MAX_DAYS,
+        )
+    ]
+
+
+def refresh_db(querystring):
+    """Pull data from API-BASKETBALL and store it locally.
+
+    The response is parsed as it arrives and written in batches, so large
+    season-wide pulls never have to fit in memory. Date ranges are fetched
+    day by day but ingested as a single batch stream and transaction.
+    """
+    client = get_client()
+    return ingest_games(
+        chain.from_iterable(
+            client.stream_games(query)
+            for query in upstream_queries(querystring)
+        )
+    )
+
+
+async def arefresh_db(querystring):
+    """``refresh_db`` for event loops.
+
+    Every day of a range is requested at once through the async client, so
+    a refresh takes about as long as the slowest day rather than the sum of
+    them, and waiting on API-BASKETBALL holds no thread. Each day's payload
+    is buffered, then everything is ingested in a thread as one batch
+    stream and transaction.
+    """
+    client = get_async_client()
+    payloads = await asyncio.gather(
+        *(client.fetch_games(query) for query in upstream_queries(querystring))
+    )
+    games = chain.from_iterable(payload["response"] for payload in payloads)
+    return await sync_to_async(ingest_games)(games)
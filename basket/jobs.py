@@ -0,0 +1,143 @@
+import logging
+import os
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from basket import metrics
+from basket.ingest import arefresh_db, refresh_db
+from basket.models import RefreshJob
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_refresh(querystring, user=None):
+    """Queue a refresh of the local DB from API-BASKETBALL"""
+    return RefreshJob.objects.create(querystring=querystring, requested_by=user)
+
+
+async def aenqueue_refresh(querystring, user=None):
+    return await RefreshJob.objects.acreate(
+        querystring=querystring, requested_by=user
+    )
+
+
+def requeue_stale_jobs():
+    """Queue again the jobs left running by a worker or ASGI process that
+    died, i.e. still running ``REFRESH_JOB_TIMEOUT`` seconds after their
+    claim. Refreshes are idempotent, so a job that was in fact only slow
+    is merely run twice.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.REFRESH_JOB_TIMEOUT)
+    requeued = RefreshJob.objects.filter(
+        status=RefreshJob.Status.RUNNING, started_at__lt=cutoff
+    ).update(status=RefreshJob.Status.QUEUED, worker="", started_at=None)
+    if requeued:
+        logger.warning("Requeued %d stale refresh jobs", requeued)
+    return requeued
+
+
+def claim_job(worker):
+    """Mark the oldest queued job as running and return it.
+
+    Stale running jobs are queued again first (see ``requeue_stale_jobs``).
+    On Postgres concurrent workers skip rows locked by each other. Backends
+    without ``SELECT ... FOR UPDATE`` (SQLite) fall back to the conditional
+    UPDATE alone, which still guarantees a job is claimed only once.
+    """
+    requeue_stale_jobs()
+    while True:
+        with transaction.atomic():
+            job = (
+                RefreshJob.objects.select_for_update(skip_locked=True)
+                .filter(status=RefreshJob.Status.QUEUED)
+                .order_by("created_at", "pk")
+                .first()
+            )
+            if job is None:
+                return None
+            claimed = RefreshJob.objects.filter(
+                pk=job.pk, status=RefreshJob.Status.QUEUED
+            ).update(
+                status=RefreshJob.Status.RUNNING,
+                worker=worker,
+                started_at=timezone.now(),
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    with metrics.collect() as timings:
+        try:
+            job.report = refresh_db(job.querystring)
+        except Exception as e:
+            _failed(job, e)
+        else:
+            job.status = RefreshJob.Status.SUCCEEDED
+    _finish(job, timings)
+    return job
+
+
+async def aclaim_job_in_process(job):
+    """Claim ``job`` for this process unless a worker took it already"""
+    claimed = await RefreshJob.objects.filter(
+        pk=job.pk, status=RefreshJob.Status.QUEUED
+    ).aupdate(
+        status=RefreshJob.Status.RUNNING,
+        worker=f"asgi:{os.getpid()}",
+        started_at=timezone.now(),
+    )
+    return bool(claimed)
+
+
+async def arun_job(job):
+    """``run_job`` for event loops, fetching with ``arefresh_db``"""
+    with metrics.collect() as timings:
+        try:
+            job.report = await arefresh_db(job.querystring)
+        except Exception as e:
+            _failed(job, e)
+        else:
+            job.status = RefreshJob.Status.SUCCEEDED
+    await sync_to_async(_finish)(job, timings)
+    return job
+
+
+def _failed(job, error):
+    logger.exception("Refresh job %s failed", job.pk)
+    job.status = RefreshJob.Status.FAILED
+    job.error = str(getattr(error, "detail", error))
+
+
+def _finish(job, timings):
+    logger.info(
+        "Refresh job %s ran %d queries (%s)",
+        job.pk,
+        timings.queries,
+        ", ".join(
+            f"{phase} {seconds:.3f}s"
+            for phase, seconds in timings.seconds.items()
+        ),
+    )
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "report", "error", "finished_at"])
+
+
+def work(worker, once=False, poll_interval=1.0):
+    """Process queued jobs forever, or until the queue is empty if ``once``"""
+    processed = 0
+    while True:
+        job = claim_job(worker)
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
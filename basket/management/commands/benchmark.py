@@ -0,0 +1,88 @@
+import json
+import os
+import platform
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from basket.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Run a benchmark against a throwaway test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=sorted(BENCHMARKS))
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            help="Dataset sizes to run the benchmark with",
+        )
+        parser.add_argument(
+            "--clients",
+            type=int,
+            help="Concurrent clients, for benchmarks that simulate load",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            help="Requests per scenario, for benchmarks that simulate load",
+        )
+        parser.add_argument(
+            "--output",
+            metavar="FILE",
+            help="Also write the results and environment as JSON to FILE",
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {
+            option: options[option]
+            for option in ("sizes", "clients", "requests")
+            if options[option]
+        }
+        results = BENCHMARKS[options["name"]](**kwargs)
+        if not results:
+            raise CommandError("The benchmark returned no results")
+        self.print_table(results)
+        if options["output"]:
+            self.write_json(options["output"], options["name"], kwargs, results)
+
+    def write_json(self, path, name, kwargs, results):
+        report = {
+            "benchmark": name,
+            "options": kwargs,
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "cpus": os.cpu_count(),
+                "platform": platform.platform(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            },
+            "results": results,
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    def print_table(self, rows):
+        columns = list(rows[0])
+        widths = {
+            column: max(
+                len(str(row.get(column, "")))
+                for row in [*rows, {column: column}]
+            )
+            for column in columns
+        }
+        self.stdout.write(
+            "  ".join(column.rjust(widths[column]) for column in columns)
+        )
+        for row in rows:
+            self.stdout.write(
+                "  ".join(
+                    str(row.get(column, "")).rjust(widths[column])
+                    for column in columns
+                )
+            )
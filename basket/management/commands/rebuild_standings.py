@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from basket import standings
+
+
+class Command(BaseCommand):
+    help = "Recompute every league standing from the stored games"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = standings.rebuild()
+        self.stdout.write(f"Rebuilt {count} standings")
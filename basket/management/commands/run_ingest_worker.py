@@ -0,0 +1,54 @@
+import os
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from basket.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Process queued refresh jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker threads to run in this process",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling an empty queue again",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        def run(name):
+            try:
+                processed = work(
+                    name,
+                    once=options["once"],
+                    poll_interval=options["poll_interval"],
+                )
+                self.stdout.write(f"{name} processed {processed} job(s)")
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=run, args=(f"{prefix}:{i}",), daemon=True)
+            for i in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,321 @@
+"""Per-request performance instrumentation.
+
+When ``METRICS_ENABLED`` is set, ``MetricsMiddleware`` times every request
+and breaks it down into phases recorded by hooks in the layers below:
+
+- ``db``: time spent executing queries (and how many were run)
+- ``auth``: token authentication, including its queries on a cache miss
+- ``serialize``: turning games into dicts
+- ``render``: encoding the response body
+- ``upstream``: requests to API-BASKETBALL
+
+Phases can overlap (``auth`` includes its ``db`` time). The breakdown is
+returned in a ``Server-Timing`` header and aggregated per view into
+histograms served in the Prometheus text format at ``/metrics``, together
+with the response cache, token cache and upstream client counters.
+
+When disabled the middleware removes itself and the hooks only do a
+context variable lookup.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+PHASES = ("db", "auth", "serialize", "render", "upstream")
+
+_current = ContextVar("basket_metrics", default=None)
+
+
+class Timings:
+    """Seconds spent per phase and queries run by one unit of work"""
+
+    __slots__ = ("seconds", "queries")
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.queries = 0
+
+
+def _execute(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.seconds["db"] += time.perf_counter() - start
+        timings.queries += 1
+
+
+def instrument(connection, **kwargs):
+    """Time the queries of ``connection`` while timings are collected.
+
+    Also a ``connection_created`` receiver: under ASGI, queries run in
+    threads other than the one collecting, and the context variable
+    follows them there.
+    """
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+@contextmanager
+def collect():
+    """Record the phases of the code run inside the block.
+
+    Yields the ``Timings`` being filled.
+    """
+    timings = Timings()
+    for alias in connections:
+        instrument(connections[alias])
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def record(phase, seconds):
+    """Add ``seconds`` to ``phase`` if timings are being collected"""
+    timings = _current.get()
+    if timings is not None:
+        timings.seconds[phase] += seconds
+
+
+@contextmanager
+def timer(phase):
+    """Time the block as ``phase`` if timings are being collected"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.seconds[phase] += time.perf_counter() - start
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _format_labels(labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+class Histogram:
+    """Thread-safe Prometheus histogram keyed by label values"""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            # One count per bucket and +Inf, then the sum
+            series = self._series.setdefault(
+                label_values, [0] * (len(self.buckets) + 2)
+            )
+            series[index] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {key: list(value) for key, value in self._series.items()}
+        for label_values, counts in sorted(series.items()):
+            labels = list(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                bucket_labels = _format_labels([*labels, ("le", bound)])
+                lines.append(
+                    f"{self.name}_bucket{{{bucket_labels}}} {cumulative}"
+                )
+            labels = _format_labels(labels)
+            lines.append(f"{self.name}_sum{{{labels}}} {counts[-1]}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+SECONDS_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+request_seconds = Histogram(
+    "basket_request_duration_seconds",
+    "Time spent handling requests.",
+    ("view", "method", "status"),
+    SECONDS_BUCKETS,
+)
+phase_seconds = Histogram(
+    "basket_request_phase_seconds",
+    "Time spent per phase of a request.",
+    ("view", "phase"),
+    SECONDS_BUCKETS,
+)
+request_queries = Histogram(
+    "basket_request_queries",
+    "Database queries run per request.",
+    ("view",),
+    (0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+response_bytes = Histogram(
+    "basket_response_bytes",
+    "Size of non-streaming response bodies.",
+    ("view",),
+    (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+HISTOGRAMS = (request_seconds, phase_seconds, request_queries, response_bytes)
+
+
+# Counters (and gauges) exposed as basket_<source>_<name>[_total]
+COUNTERS = {
+    "response_cache": ("hits", "misses"),
+    "token_cache": ("hits", "misses", "evictions"),
+    "upstream": (
+        "requests",
+        "retries",
+        "failures",
+        "bytes_received",
+        "latency_seconds",
+    ),
+}
+GAUGES = {"token_cache": ("size",)}
+
+
+def _stats():
+    # Imported here so that basket.auth and basket.upstream can use the
+    # hooks above without an import cycle
+    from basket import cache
+    from basket.auth import token_cache
+    from basket.upstream import get_client
+
+    return {
+        "response_cache": cache.stats(),
+        "token_cache": token_cache.stats(),
+        "upstream": get_client().stats,
+    }
+
+
+def expose():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    for source, stats in _stats().items():
+        for name in COUNTERS.get(source, ()):
+            metric = f"basket_{source}_{name}_total"
+            lines.extend(
+                [f"# TYPE {metric} counter", f"{metric} {stats[name]}"]
+            )
+        for name in GAUGES.get(source, ()):
+            metric = f"basket_{source}_{name}"
+            lines.extend([f"# TYPE {metric} gauge", f"{metric} {stats[name]}"])
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(timings, total):
+    """``Server-Timing`` header value, durations in milliseconds"""
+    entries = []
+    for phase in PHASES:
+        if phase in timings.seconds:
+            entry = f"{phase};dur={timings.seconds[phase] * 1000:.1f}"
+            if phase == "db":
+                entry += f';desc="{timings.queries} queries"'
+            entries.append(entry)
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _view_name(request):
+    match = request.resolver_match
+    # Unresolved paths would give every 404 its own series
+    return match.view_name if match else "unresolved"
+
+
+class MetricsMiddleware:
+    """Time requests and add a ``Server-Timing`` header.
+
+    Put it first in ``MIDDLEWARE`` so the other middleware is included.
+    Streamed responses are timed up to their first byte.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        connection_created.connect(instrument, dispatch_uid=__name__)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with collect() as timings:
+            response = self.get_response(request)
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with collect() as timings:
+            response = await self.get_response(request)
+        return self.finish(request, response, timings, start)
+
+    def finish(self, request, response, timings, start):
+        total = time.perf_counter() - start
+        view = _view_name(request)
+        request_seconds.observe(
+            total, view, request.method, str(response.status_code)
+        )
+        for phase, seconds in timings.seconds.items():
+            phase_seconds.observe(seconds, view, phase)
+        request_queries.observe(timings.queries, view)
+        if not response.streaming:
+            response_bytes.observe(len(response.content), view)
+        response["Server-Timing"] = server_timing(timings, total)
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("basket", "0002_refreshjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="country",
+            name="fingerprint",
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="fingerprint",
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="league",
+            name="fingerprint",
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name="team",
+            name="fingerprint",
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("basket", "0003_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(fields=["date", "id"], name="game_date_id_idx"),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("basket", "0004_game_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="game",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="games",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
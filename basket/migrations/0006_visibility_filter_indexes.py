@@ -0,0 +1,78 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("basket", "0005_game_user_foreign_key"),
+    ]
+
+    operations = [
+        # Build the composite indexes before dropping the FK indexes they cover
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["country", "date", "id"], name="game_country_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                condition=models.Q(("user", None)),
+                fields=["country", "date", "id"],
+                name="game_unassigned_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["user", "date", "id"], name="game_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["league", "date", "id"], name="game_league_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="league",
+            index=models.Index(fields=["season"], name="league_season_idx"),
+        ),
+        migrations.AlterField(
+            model_name="game",
+            name="country",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="games",
+                to="basket.country",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="game",
+            name="league",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="games",
+                to="basket.league",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="game",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="games",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
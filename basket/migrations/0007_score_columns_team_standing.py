@@ -0,0 +1,251 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:29
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+import django.db.models.deletion
+
+
+SCORE_KEYS = (
+    "quarter_1",
+    "quarter_2",
+    "quarter_3",
+    "quarter_4",
+    "over_time",
+    "total",
+)
+
+
+# status.short of games whose score is final
+FINISHED_STATUSES = ("FT", "AOT")
+
+STANDING_COUNTERS = (
+    "played",
+    "wins",
+    "losses",
+    "points_for",
+    "points_against",
+    "quarter_1_for",
+    "quarter_2_for",
+    "quarter_3_for",
+    "quarter_4_for",
+    "over_time_for",
+)
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def fill_score_columns(apps, schema_editor):
+    Game = apps.get_model("basket", "Game")
+    games = Game.objects.using(schema_editor.connection.alias)
+    columns = [
+        f"{side}_{key}" for side in ("home", "away") for key in SCORE_KEYS
+    ]
+    batch = []
+    for game in games.only("home_score", "away_score").iterator(
+        chunk_size=1000
+    ):
+        for side in ("home", "away"):
+            score = getattr(game, f"{side}_score") or {}
+            for key in SCORE_KEYS:
+                setattr(game, f"{side}_{key}", _int(score.get(key)))
+        batch.append(game)
+        if len(batch) == 1000:
+            games.bulk_update(batch, columns)
+            batch = []
+    if batch:
+        games.bulk_update(batch, columns)
+
+
+def fill_standings(apps, schema_editor):
+    """Build TeamStanding from the finished games already stored, like
+    basket.standings.rebuild() against the models of this migration"""
+    alias = schema_editor.connection.alias
+    Game = apps.get_model("basket", "Game")
+    TeamStanding = apps.get_model("basket", "TeamStanding")
+    games = Game.objects.using(alias).filter(
+        status__short__in=FINISHED_STATUSES,
+        home_total__isnull=False,
+        away_total__isnull=False,
+    )
+    totals = defaultdict(lambda: dict.fromkeys(STANDING_COUNTERS, 0))
+    for side, other in (("home", "away"), ("away", "home")):
+        rows = (
+            games.values_list("league_id", f"{side}_team_id")
+            .annotate(
+                played=Count("id"),
+                wins=Count(
+                    "id", filter=Q(**{f"{side}_total__gt": F(f"{other}_total")})
+                ),
+                losses=Count(
+                    "id", filter=Q(**{f"{side}_total__lt": F(f"{other}_total")})
+                ),
+                points_for=Sum(f"{side}_total"),
+                points_against=Sum(f"{other}_total"),
+                quarter_1_for=Sum(f"{side}_quarter_1"),
+                quarter_2_for=Sum(f"{side}_quarter_2"),
+                quarter_3_for=Sum(f"{side}_quarter_3"),
+                quarter_4_for=Sum(f"{side}_quarter_4"),
+                over_time_for=Sum(f"{side}_over_time"),
+            )
+            .order_by()
+        )
+        for league_id, team_id, *values in rows:
+            row = totals[league_id, team_id]
+            for name, value in zip(STANDING_COUNTERS, values):
+                row[name] += value or 0
+    TeamStanding.objects.using(alias).bulk_create(
+        [
+            TeamStanding(league_id=league_id, team_id=team_id, **values)
+            for (league_id, team_id), values in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("basket", "0006_visibility_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="away_over_time",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="away_quarter_1",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="away_quarter_2",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="away_quarter_3",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="away_quarter_4",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="away_total",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="home_over_time",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="home_quarter_1",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="home_quarter_2",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="home_quarter_3",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="home_quarter_4",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="home_total",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.CreateModel(
+            name="TeamStanding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("played", models.PositiveIntegerField(default=0)),
+                ("wins", models.PositiveIntegerField(default=0)),
+                ("losses", models.PositiveIntegerField(default=0)),
+                ("points_for", models.PositiveIntegerField(default=0)),
+                ("points_against", models.PositiveIntegerField(default=0)),
+                ("quarter_1_for", models.PositiveIntegerField(default=0)),
+                ("quarter_2_for", models.PositiveIntegerField(default=0)),
+                ("quarter_3_for", models.PositiveIntegerField(default=0)),
+                ("quarter_4_for", models.PositiveIntegerField(default=0)),
+                ("over_time_for", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "league",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="standings",
+                        to="basket.league",
+                    ),
+                ),
+                (
+                    "team",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="standings",
+                        to="basket.team",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="teamstanding",
+            constraint=models.UniqueConstraint(
+                fields=("league", "team"), name="unique_league_team_standing"
+            ),
+        ),
+        migrations.RunPython(fill_score_columns, migrations.RunPython.noop),
+        migrations.RunPython(fill_standings, migrations.RunPython.noop),
+    ]
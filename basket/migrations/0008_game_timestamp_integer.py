@@ -0,0 +1,131 @@
+from django.db import migrations, models, transaction
+from django.db.migrations.operations.base import Operation
+from django.db.models.functions import Cast
+
+BATCH_SIZE = 2000
+
+
+def _copy(games, after=None):
+    """Copy timestamp into timestamp_int for rows that have none, by pk"""
+    while True:
+        batch = (
+            games.filter(timestamp_int=None)
+            .order_by("pk")
+            .only("pk", "timestamp", "date")
+        )
+        if after is not None:
+            batch = batch.filter(pk__gt=after)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            return
+        for game in batch:
+            try:
+                game.timestamp_int = int(game.timestamp)
+            except (TypeError, ValueError):
+                game.timestamp_int = int(game.date.timestamp())
+        yield batch
+        after = batch[-1].pk
+
+
+def copy_timestamps(apps, schema_editor):
+    """Fill timestamp_int in short per-batch transactions.
+
+    Each batch only locks its own rows, so assignment keeps running while
+    most of the table is converted. Rows already copied are skipped, so an
+    interrupted run can simply be restarted. Rows written in the meantime
+    are caught up by ``copy_remaining_timestamps``.
+    """
+    Game = apps.get_model("basket", "Game")
+    games = Game.objects.using(schema_editor.connection.alias)
+    for batch in _copy(games):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            games.bulk_update(batch, ["timestamp_int"])
+
+
+def copy_remaining_timestamps(apps, schema_editor):
+    """Copy the rows inserted or updated since ``copy_timestamps`` ran.
+
+    Runs in the transaction that swaps the columns. The table is locked
+    against writes first, so no row can be left without a timestamp
+    between this copy and the swap.
+    """
+    connection = schema_editor.connection
+    Game = apps.get_model("basket", "Game")
+    if connection.vendor == "postgresql":
+        table = schema_editor.quote_name(Game._meta.db_table)
+        schema_editor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+    games = Game.objects.using(connection.alias)
+    # Earlier rows may have been updated too, so rescan the whole table
+    games.filter(timestamp_int__isnull=False).exclude(
+        timestamp=Cast("timestamp_int", models.CharField())
+    ).update(timestamp_int=None)
+    for batch in _copy(games):
+        games.bulk_update(batch, ["timestamp_int"])
+
+
+class Atomic(Operation):
+    """Run ``operations`` in a single transaction in a non-atomic migration"""
+
+    reduces_to_sql = False
+    # The old string column is gone once the swap is done
+    reversible = False
+
+    def __init__(self, operations):
+        self.operations = operations
+
+    def deconstruct(self):
+        return (self.__class__.__name__, [self.operations], {})
+
+    def state_forwards(self, app_label, state):
+        for operation in self.operations:
+            operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for operation in self.operations:
+                state = from_state.clone()
+                operation.state_forwards(app_label, state)
+                operation.database_forwards(
+                    app_label, schema_editor, from_state, state
+                )
+                from_state = state
+
+    def describe(self):
+        return "In one transaction: " + "; ".join(
+            operation.describe() for operation in self.operations
+        )
+
+
+class Migration(migrations.Migration):
+    # Lets copy_timestamps commit batch by batch
+    atomic = False
+
+    dependencies = [
+        ("basket", "0007_score_columns_team_standing"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="timestamp_int",
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(copy_timestamps, migrations.RunPython.noop),
+        # If anything fails here the old column is still in place
+        Atomic(
+            [
+                migrations.RunPython(copy_remaining_timestamps),
+                migrations.RemoveField(model_name="game", name="timestamp"),
+                migrations.RenameField(
+                    model_name="game",
+                    old_name="timestamp_int",
+                    new_name="timestamp",
+                ),
+                migrations.AlterField(
+                    model_name="game",
+                    name="timestamp",
+                    field=models.BigIntegerField(),
+                ),
+            ]
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("basket", "0008_game_timestamp_integer"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuarantinedGame",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "game_id",
+                    models.IntegerField(blank=True, db_index=True, null=True),
+                ),
+                ("payload", models.JSONField()),
+                ("errors", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
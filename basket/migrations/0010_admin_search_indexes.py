@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import migrations
+
+# The admin searches with icontains, which PostgreSQL runs as
+# UPPER(column) LIKE UPPER('%term%'). Only a trigram index on that
+# expression can serve it.
+TRIGRAM_INDEXES = (
+    ("team_name_trgm_idx", "basket", "Team", "name"),
+    ("league_name_trgm_idx", "basket", "League", "name"),
+    (
+        "user_username_trgm_idx",
+        *settings.AUTH_USER_MODEL.split("."),
+        "username",
+    ),
+)
+
+
+def _indexes(apps):
+    for name, app_label, model_name, field in TRIGRAM_INDEXES:
+        model = apps.get_model(app_label, model_name)
+        field = model._meta.get_field(field)
+        yield name, model._meta.db_table, field.column
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    quote = schema_editor.quote_name
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in _indexes(apps):
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} "
+            f"USING gin (UPPER({quote(column)}) gin_trgm_ops)"
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in _indexes(apps):
+        schema_editor.execute(
+            f"DROP INDEX IF EXISTS {schema_editor.quote_name(name)}"
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("basket", "0009_quarantinedgame"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+def drop_duplicates(apps, schema_editor):
+    """Keep only the latest quarantined copy of each game"""
+    QuarantinedGame = apps.get_model("basket", "QuarantinedGame")
+    quarantined = QuarantinedGame.objects.using(schema_editor.connection.alias)
+    latest = (
+        quarantined.exclude(game_id=None)
+        .values("game_id")
+        .annotate(latest=models.Max("pk"), copies=models.Count("pk"))
+        .filter(copies__gt=1)
+    )
+    for row in latest.iterator():
+        quarantined.filter(game_id=row["game_id"]).exclude(
+            pk=row["latest"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("basket", "0010_admin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="quarantinedgame",
+            name="game_id",
+            field=models.IntegerField(blank=True, null=True, unique=True),
+        ),
+    ]
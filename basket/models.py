@@ -2,13 +2,15 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
 
-from basket.validators import ScoreValidator, StatusValidator
+from basket.validators import SCORE_KEYS, ScoreValidator, StatusValidator
 
 
 class BaseExternalModel(models.Model):
     id = models.IntegerField(primary_key=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Hash of the upstream payload this row was last synced from
+    fingerprint = models.CharField(max_length=32, blank=True, editable=False)
 
     class Meta:
         abstract = True
@@ -20,6 +22,10 @@ class League(BaseExternalModel):
     season = models.CharField(max_length=128)
     logo = models.CharField(max_length=128, blank=True)
 
+    class Meta:
+        # ?season= filters on league__season
+        indexes = [models.Index(fields=["season"], name="league_season_idx")]
+
     def __str__(self):
         return self.name
 
@@ -65,19 +71,44 @@ class Team(BaseExternalModel):
         super().save(*args, **kwargs)
 
 
+# status.short of games whose score is final
+FINISHED_STATUSES = ("FT", "AOT")
+
+
+def score_column():
+    return models.PositiveSmallIntegerField(
+        null=True, blank=True, editable=False
+    )
+
+
+def score_columns(home_score, away_score):
+    """Map score JSON to the typed ``<side>_<key>`` columns of Game"""
+    columns = {}
+    for side, score in (("home", home_score), ("away", away_score)):
+        for key in SCORE_KEYS:
+            try:
+                value = int((score or {}).get(key))
+            except (TypeError, ValueError):
+                value = None
+            columns[f"{side}_{key}"] = value
+    return columns
+
+
 class Game(BaseExternalModel):
     date = models.DateTimeField()
     time = models.CharField(max_length=128)
-    timestamp = models.CharField(max_length=128)
+    # Unix time of tip-off, as sent by API-BASKETBALL
+    timestamp = models.BigIntegerField()
     timezone = models.CharField(max_length=128)
     stage = models.CharField(max_length=128, blank=True)  # ?
     week = models.CharField(max_length=128, blank=True)  # ?
 
+    # Covered by the composite indexes in Meta, which lead with the FK
     league = models.ForeignKey(
-        League, on_delete=models.PROTECT, related_name="games"
+        League, on_delete=models.PROTECT, related_name="games", db_index=False
     )
     country = models.ForeignKey(
-        Country, on_delete=models.PROTECT, related_name="games"
+        Country, on_delete=models.PROTECT, related_name="games", db_index=False
     )
 
     status = models.JSONField(validators=[StatusValidator()])
@@ -92,13 +123,51 @@ class Game(BaseExternalModel):
     home_score = models.JSONField(validators=[ScoreValidator()])
     away_score = models.JSONField(validators=[ScoreValidator()])
 
-    user = models.OneToOneField(
+    # Typed copies of the score JSON, kept in sync by save() and ingest
+    home_quarter_1 = score_column()
+    home_quarter_2 = score_column()
+    home_quarter_3 = score_column()
+    home_quarter_4 = score_column()
+    home_over_time = score_column()
+    home_total = score_column()
+    away_quarter_1 = score_column()
+    away_quarter_2 = score_column()
+    away_quarter_3 = score_column()
+    away_quarter_4 = score_column()
+    away_over_time = score_column()
+    away_total = score_column()
+
+    user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
+        related_name="games",
+        db_index=False,
     )
 
+    class Meta:
+        indexes = [
+            # Keyset pagination (see basket.pagination)
+            models.Index(fields=["date", "id"], name="game_date_id_idx"),
+            # Lists scoped to a user's countries, in page order
+            models.Index(
+                fields=["country", "date", "id"], name="game_country_date_idx"
+            ),
+            # /games/unassigned/ and claim-next only ever read free games
+            models.Index(
+                fields=["country", "date", "id"],
+                condition=models.Q(user=None),
+                name="game_unassigned_idx",
+            ),
+            models.Index(
+                fields=["user", "date", "id"], name="game_user_date_idx"
+            ),
+            models.Index(
+                fields=["league", "date", "id"], name="game_league_date_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.home_team.name} vs. {self.away_team}"
 
@@ -119,6 +188,10 @@ class Game(BaseExternalModel):
         for field in fields:
             if getattr(self, field) is None:
                 setattr(self, field, "")
+        for name, value in score_columns(
+            self.home_score, self.away_score
+        ).items():
+            setattr(self, name, value)
         super().save(*args, **kwargs)
 
 
@@ -131,3 +204,90 @@ class Profile(models.Model):
 
     def __str__(self):
         return f"{self.user.username}'s profile"
+
+
+class TeamStanding(models.Model):
+    """Per league record of a team, summed over its finished games.
+
+    Rows are derived from Game and rebuilt for the affected league/team
+    pairs whenever games change (see ``basket.standings``).
+    """
+
+    league = models.ForeignKey(
+        League, on_delete=models.CASCADE, related_name="standings"
+    )
+    team = models.ForeignKey(
+        Team, on_delete=models.CASCADE, related_name="standings"
+    )
+    played = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    points_for = models.PositiveIntegerField(default=0)
+    points_against = models.PositiveIntegerField(default=0)
+    quarter_1_for = models.PositiveIntegerField(default=0)
+    quarter_2_for = models.PositiveIntegerField(default=0)
+    quarter_3_for = models.PositiveIntegerField(default=0)
+    quarter_4_for = models.PositiveIntegerField(default=0)
+    over_time_for = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["league", "team"], name="unique_league_team_standing"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.team} in {self.league}"
+
+
+class QuarantinedGame(models.Model):
+    """An upstream game dict that failed validation during ingest"""
+
+    # Upstream id, when the payload has a usable one
+    game_id = models.IntegerField(null=True, blank=True, unique=True)
+    payload = models.JSONField()
+    errors = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Quarantined game {self.game_id or '?'} ({self.created_at})"
+
+
+class RefreshJob(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        SUCCEEDED = "succeeded"
+        FAILED = "failed"
+
+    querystring = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="refresh_jobs",
+    )
+    worker = models.CharField(max_length=128, blank=True)
+    report = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    @property
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    def __str__(self):
+        return f"Refresh job {self.pk} ({self.status})"
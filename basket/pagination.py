@@ -0,0 +1,131 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class GameCursorPagination(BasePagination):
+    """Keyset pagination over games ordered by ``(date, id)``.
+
+    The opaque cursor holds the ``(date, id)`` of the last row seen, so every
+    page is an index range scan starting right after it and page N costs the
+    same as page 1, unlike OFFSET or DRF's cursor offsets on ties.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.GAMES_PAGE_SIZE
+        return max(1, min(page_size, settings.GAMES_MAX_PAGE_SIZE))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            date = parse_datetime(data["d"])
+            if date is None:
+                raise ValueError
+            return date, int(data["i"]), bool(data["r"])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item, reverse):
+        date, pk = self.get_position(item)
+        data = json.dumps({"d": date.isoformat(), "i": pk, "r": int(reverse)})
+        encoded = base64.urlsafe_b64encode(data.encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_position(self, item):
+        if isinstance(item, dict):
+            return item["date"], item["id"]
+        return item.date, item.pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    def page_queryset(self, queryset, request):
+        """Slice of ``queryset`` holding the requested page plus one row.
+
+        Pass the rows to ``set_page()``. Split from ``paginate_queryset()``
+        so async views can fetch them with the async ORM.
+        """
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            queryset = queryset.order_by("date", "id")
+        else:
+            date, pk, reverse = cursor
+            if reverse:
+                queryset = (
+                    queryset.filter(date__lte=date)
+                    .filter(Q(date__lt=date) | Q(id__lt=pk))
+                    .order_by("-date", "-id")
+                )
+            else:
+                queryset = (
+                    queryset.filter(date__gte=date)
+                    .filter(Q(date__gt=date) | Q(id__gt=pk))
+                    .order_by("date", "id")
+                )
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, page):
+        reverse = self.cursor is not None and self.cursor[2]
+        has_more = len(page) > self.page_size
+        page = page[: self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = page
+        return page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
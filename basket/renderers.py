@@ -0,0 +1,46 @@
+import json
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+from basket import metrics
+
+
+def ndjson_line(data):
+    return (
+        json.dumps(
+            data,
+            cls=encoders.JSONEncoder,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+        + b"\n"
+    )
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """Newline-delimited JSON, one object per line.
+
+    Game lists are streamed by the view in this format (see
+    ``GameViewSet.streaming_response``). Other responses, such as errors
+    or a single game, are rendered as a single line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, list):
+            return b"".join(ndjson_line(item) for item in data)
+        return ndjson_line(data)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSON renderer, timed as the ``render`` phase"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with metrics.timer("render"):
+            return super().render(data, accepted_media_type, renderer_context)
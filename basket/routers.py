@@ -0,0 +1,115 @@
+"""Primary/replica database routing.
+
+Writes always go to ``default``, the primary. Reads go there too unless
+they run inside ``replica_reads()``, which ``GameViewSet`` enters for its
+read actions and ``BearerTokenAuthentication`` for its lookups. Those reads
+use the ``replica`` database when one is configured, except:
+
+- inside a transaction on the primary, so that ``refresh_db`` and
+  ``assign`` read what they are about to write
+- for users who wrote something in the last ``REPLICA_STICKY_SECONDS``
+  seconds, so they never see their own changes undone by replication lag
+
+Stickiness is kept in the Django cache, so configure a shared cache backend
+when running several workers.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = "replica"
+
+_current = ContextVar("basket_routing", default=None)
+
+
+class Routing:
+    """Routing state of one request"""
+
+    __slots__ = ("replica", "user_id", "wrote")
+
+    def __init__(self):
+        self.replica = False
+        self.user_id = None
+        self.wrote = False
+
+
+def _sticky_key(user_id):
+    return f"db:primary:user:{user_id}"
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Allow (or, with ``enabled=False``, forbid) reads from the replica
+    inside the block.
+
+    The outermost block also watches for writes and, once it exits, keeps
+    the reads of the user passed to ``identify()`` on the primary for a
+    while if there were any.
+    """
+    routing = _current.get()
+    token = None
+    if routing is None:
+        routing = Routing()
+        token = _current.set(routing)
+    previous = routing.replica
+    routing.replica = enabled
+    try:
+        yield routing
+    finally:
+        routing.replica = previous
+        if token is not None:
+            _current.reset(token)
+            if routing.wrote and routing.user_id is not None:
+                stick(routing.user_id)
+
+
+def stick(user_id):
+    """Keep the reads of user ``user_id`` on the primary for
+    ``REPLICA_STICKY_SECONDS``, for writes made outside ``replica_reads()``"""
+    cache.set(_sticky_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def identify(user):
+    """Attribute the current request to ``user``, sending its reads to the
+    primary if the user wrote recently"""
+    routing = _current.get()
+    if routing is None or not user.is_authenticated:
+        return
+    routing.user_id = user.pk
+    if cache.get(_sticky_key(user.pk)):
+        routing.replica = False
+
+
+class PrimaryReplicaRouter:
+    """Database router implementing the rules above.
+
+    Without a ``replica`` database everything goes to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        if (
+            routing is not None
+            and routing.replica
+            and REPLICA_DB_ALIAS in settings.DATABASES
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica gets its schema through replication
+        return db != REPLICA_DB_ALIAS
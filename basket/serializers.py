@@ -1,24 +1,36 @@
+from operator import itemgetter
+
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
 from rest_framework import serializers
 
-from basket.models import Country, Game, League, Team
+from basket.models import (
+    Country,
+    Game,
+    League,
+    RefreshJob,
+    Team,
+    TeamStanding,
+    score_columns,
+)
 
 
 class CountrySerializer(serializers.ModelSerializer):
     class Meta:
         model = Country
-        exclude = ("created_at", "updated_at")
+        exclude = ("created_at", "updated_at", "fingerprint")
 
 
 class LeagueSerializer(serializers.ModelSerializer):
     class Meta:
         model = League
-        exclude = ("created_at", "updated_at")
+        exclude = ("created_at", "updated_at", "fingerprint")
 
 
 class TeamSerializer(serializers.ModelSerializer):
     class Meta:
         model = Team
-        exclude = ("created_at", "updated_at")
+        exclude = ("created_at", "updated_at", "fingerprint")
 
 
 class GameSerializer(serializers.ModelSerializer):
@@ -32,10 +44,12 @@ class GameSerializer(serializers.ModelSerializer):
         exclude = (
             "created_at",
             "updated_at",
+            "fingerprint",
             "home_team",
             "away_team",
             "home_score",
             "away_score",
+            *score_columns(None, None),
         )
 
     def get_teams(self, obj):
@@ -49,3 +63,166 @@ class GameSerializer(serializers.ModelSerializer):
             "home": obj.home_score,
             "away": obj.away_score,
         }
+
+
+def _tree(serializer, prefix=""):
+    """Map a serializer's fields to ``values()`` columns.
+
+    Returns a list of ``(name, node)`` where ``node`` is either a
+    ``(column, field)`` leaf or, for nested serializers, another such list.
+    """
+    return [
+        (
+            name,
+            _tree(field, f"{prefix}{field.source}__")
+            if isinstance(field, serializers.BaseSerializer)
+            else (prefix + field.source, field),
+        )
+        for name, field in serializer.fields.items()
+    ]
+
+
+def _getter(column, field):
+    fetch = itemgetter(column)
+    if isinstance(
+        field,
+        (
+            serializers.CharField,
+            serializers.IntegerField,
+            serializers.RelatedField,
+        ),
+    ) or (isinstance(field, serializers.JSONField) and not field.binary):
+        # The database value is already what to_representation() returns
+        return fetch
+    to_representation = field.to_representation
+
+    def get(row):
+        value = fetch(row)
+        return None if value is None else to_representation(value)
+
+    return get
+
+
+def _compile(tree):
+    """Return the columns a tree reads and a callable rendering one row"""
+    columns = []
+    getters = []
+    for name, node in tree:
+        if isinstance(node, list):
+            node_columns, getter = _compile(node)
+            columns.extend(node_columns)
+        else:
+            column, field = node
+            columns.append(column)
+            getter = _getter(column, field)
+        getters.append((name, getter))
+
+    def render(row):
+        return {name: getter(row) for name, getter in getters}
+
+    return columns, render
+
+
+class FastGameSerializer:
+    """Read-only fast path producing exactly ``GameSerializer``'s output.
+
+    Instead of building a serializer per row (plus nested country, league
+    and team serializers), the fields of ``GameSerializer`` are compiled
+    once into getters over a ``values()`` projection. Use
+    ``serialize(queryset)``, or ``to_representation(row)`` on rows of
+    ``queryset.values(*columns)``.
+    """
+
+    @cached_property
+    def _compiled(self):
+        method_fields = {
+            "teams": [
+                (side, _tree(TeamSerializer(), f"{side}_team__"))
+                for side in ("home", "away")
+            ],
+            "scores": [
+                (side, (f"{side}_score", serializers.JSONField()))
+                for side in ("home", "away")
+            ],
+        }
+        tree = [
+            (name, method_fields.get(name, node))
+            for name, node in _tree(GameSerializer())
+        ]
+        return _compile(tree)
+
+    @property
+    def columns(self):
+        return self._compiled[0]
+
+    def to_representation(self, row):
+        return self._compiled[1](row)
+
+    def serialize(self, queryset, chunk_size=None):
+        rows = queryset.values(*self.columns)
+        if chunk_size:
+            rows = rows.iterator(chunk_size=chunk_size)
+        render = self._compiled[1]
+        for row in rows:
+            yield render(row)
+
+
+class RefreshJobSerializer(serializers.ModelSerializer):
+    duration = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = RefreshJob
+        fields = (
+            "id",
+            "status",
+            "querystring",
+            "requested_by",
+            "worker",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "duration",
+            "report",
+            "error",
+        )
+
+
+class BulkAssignSerializer(serializers.Serializer):
+    games = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=10000
+    )
+    user = serializers.PrimaryKeyRelatedField(
+        queryset=get_user_model().objects.all(), allow_null=True
+    )
+
+
+class TeamStandingSerializer(serializers.ModelSerializer):
+    team = TeamSerializer()
+    point_difference = serializers.IntegerField()
+
+    class Meta:
+        model = TeamStanding
+        fields = (
+            "team",
+            "played",
+            "wins",
+            "losses",
+            "points_for",
+            "points_against",
+            "point_difference",
+        )
+
+
+class TeamLeagueStatsSerializer(serializers.ModelSerializer):
+    league = LeagueSerializer()
+
+    class Meta:
+        model = TeamStanding
+        fields = (
+            "league",
+            "played",
+            "wins",
+            "losses",
+            "points_for",
+            "points_against",
+        )
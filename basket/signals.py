@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from basket import cache, standings
+from basket.auth import token_cache
+from basket.models import Country, Game, League, Profile, Team
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def invalidate_game_lists(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cache.invalidate_countries([instance.country_id])
+    if instance.user_id is not None:
+        cache.invalidate_user(instance.user_id)
+
+
+# Columns that decide which standings a game counts towards, and the
+# names save(update_fields=...) may give them
+STANDING_KEYS = ("league_id", "home_team_id", "away_team_id")
+STANDING_FIELDS = {"league", "home_team", "away_team", *STANDING_KEYS}
+
+
+@receiver(pre_save, sender=Game)
+def remember_standing_keys(sender, instance, raw=False, **kwargs):
+    # A game moved to another league or team leaves its old standings
+    # behind; read where it was so refresh_standings can fix those too
+    update_fields = kwargs.get("update_fields")
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not STANDING_FIELDS & update_fields:
+        return
+    instance._previous_standing_keys = (
+        Game.objects.filter(pk=instance.pk).values(*STANDING_KEYS).first()
+    )
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def refresh_standings(sender, instance, raw=False, **kwargs):
+    # Ingest writes in bulk and refreshes standings itself
+    previous = instance.__dict__.pop("_previous_standing_keys", None)
+    if not raw:
+        standings.refresh(standings.game_pairs(instance, previous))
+
+
+@receiver(post_save, sender=League)
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=Team)
+def invalidate_nested_data(sender, raw=False, **kwargs):
+    # Leagues, countries and teams are rendered inside every game
+    if not raw:
+        cache.invalidate_all()
+
+
+@receiver(m2m_changed, sender=Profile.countries.through)
+def invalidate_profile_scope(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, Profile):
+        user_ids = [instance.user_id]
+    else:
+        # Changed from the country side: pk_set holds profile ids
+        profiles = Profile.objects.all()
+        if pk_set is not None:
+            profiles = profiles.filter(pk__in=pk_set)
+        user_ids = profiles.values_list("user_id", flat=True)
+    for user_id in user_ids:
+        cache.invalidate_user(user_id)
+        token_cache.delete_user(user_id)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile(sender, instance, **kwargs):
+    cache.invalidate_user(instance.user_id)
+    token_cache.delete_user(instance.user_id)
+
+
+@receiver(pre_delete, sender=User)
+def invalidate_freed_games(sender, instance, **kwargs):
+    # Game.user is SET_NULL: the user's games are freed by a bulk UPDATE
+    # that sends no Game signals, so expire their countries' lists once
+    # that is committed
+    country_ids = list(
+        Game.objects.filter(user=instance)
+        .values_list("country_id", flat=True)
+        .distinct()
+    )
+    if country_ids:
+        transaction.on_commit(lambda: cache.invalidate_countries(country_ids))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    # Covers deactivation and staff status changes
+    token_cache.delete_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
@@ -0,0 +1,197 @@
+"""League standings and team stats, kept in the TeamStanding table.
+
+Standings are derived from the typed score columns of finished games.
+Instead of recomputing everything when games change, ``refresh`` rebuilds
+only the given (league, team) pairs with one grouped aggregate per side.
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, Q, Sum
+
+from basket.models import FINISHED_STATUSES, Game, TeamStanding
+
+BATCH_SIZE = 500
+
+COUNTERS = (
+    "played",
+    "wins",
+    "losses",
+    "points_for",
+    "points_against",
+    "quarter_1_for",
+    "quarter_2_for",
+    "quarter_3_for",
+    "quarter_4_for",
+    "over_time_for",
+)
+
+# Game columns whose change can move a standing
+GAME_FIELDS = {
+    "league_id",
+    "home_team_id",
+    "away_team_id",
+    "status",
+    "home_total",
+    "away_total",
+    "home_quarter_1",
+    "home_quarter_2",
+    "home_quarter_3",
+    "home_quarter_4",
+    "home_over_time",
+    "away_quarter_1",
+    "away_quarter_2",
+    "away_quarter_3",
+    "away_quarter_4",
+    "away_over_time",
+}
+
+
+def finished_games():
+    return Game.objects.filter(
+        status__short__in=FINISHED_STATUSES,
+        home_total__isnull=False,
+        away_total__isnull=False,
+    )
+
+
+def game_pairs(game, previous=None):
+    """(league, team) pairs a game counts towards, before and after a change"""
+    previous = previous or {}
+    pairs = set()
+    for values in ({}, previous):
+        league_id = values.get("league_id", game.league_id)
+        for side in ("home_team_id", "away_team_id"):
+            pairs.add((league_id, values.get(side, getattr(game, side))))
+    return pairs
+
+
+def _side_totals(side, other, league_ids, team_ids):
+    """Per (league, team) sums over the games a team played as ``side``"""
+    team = f"{side}_team_id"
+    return (
+        finished_games()
+        .filter(league_id__in=league_ids, **{f"{team}__in": team_ids})
+        .values_list("league_id", team)
+        .annotate(
+            played=Count("id"),
+            wins=Count(
+                "id", filter=Q(**{f"{side}_total__gt": F(f"{other}_total")})
+            ),
+            losses=Count(
+                "id", filter=Q(**{f"{side}_total__lt": F(f"{other}_total")})
+            ),
+            points_for=Sum(f"{side}_total"),
+            points_against=Sum(f"{other}_total"),
+            quarter_1_for=Sum(f"{side}_quarter_1"),
+            quarter_2_for=Sum(f"{side}_quarter_2"),
+            quarter_3_for=Sum(f"{side}_quarter_3"),
+            quarter_4_for=Sum(f"{side}_quarter_4"),
+            over_time_for=Sum(f"{side}_over_time"),
+        )
+        .order_by()
+    )
+
+
+def refresh(pairs, batch_size=BATCH_SIZE):
+    """Rebuild the standings of the given (league_id, team_id) pairs.
+
+    Costs a few queries per ``batch_size`` pairs no matter how many games
+    they cover. Pairs left without finished games are deleted.
+    """
+    pairs = sorted(pairs)
+    for start in range(0, len(pairs), batch_size):
+        _refresh(set(pairs[start : start + batch_size]))
+    return len(pairs)
+
+
+def _refresh(pairs):
+    league_ids = {league_id for league_id, _ in pairs}
+    team_ids = {team_id for _, team_id in pairs}
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for side, other in (("home", "away"), ("away", "home")):
+        for league_id, team_id, *values in _side_totals(
+            side, other, league_ids, team_ids
+        ):
+            if (league_id, team_id) not in pairs:
+                continue
+            row = totals[league_id, team_id]
+            for name, value in zip(COUNTERS, values):
+                row[name] += value or 0
+
+    if totals:
+        TeamStanding.objects.bulk_create(
+            [
+                TeamStanding(league_id=league_id, team_id=team_id, **values)
+                for (league_id, team_id), values in totals.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["league", "team"],
+            update_fields=[*COUNTERS, "updated_at"],
+        )
+    empty = pairs - totals.keys()
+    if empty:
+        TeamStanding.objects.filter(
+            reduce(
+                or_,
+                (
+                    Q(league_id=league_id, team_id=team_id)
+                    for league_id, team_id in empty
+                ),
+            )
+        ).delete()
+
+
+def rebuild():
+    """Recompute every standing from scratch"""
+    pairs = set()
+    for side in ("home_team_id", "away_team_id"):
+        pairs.update(finished_games().values_list("league_id", side).distinct())
+    stale = set(TeamStanding.objects.values_list("league_id", "team_id"))
+    return refresh(pairs | stale)
+
+
+def league_table(league):
+    """Standings of a league, best record first"""
+    return (
+        TeamStanding.objects.filter(league=league)
+        .select_related("team")
+        .annotate(point_difference=F("points_for") - F("points_against"))
+        .order_by("-wins", "losses", "-point_difference", "team__name")
+    )
+
+
+def team_stats(team):
+    """Totals and per game averages of a team across all its leagues"""
+    standings = list(
+        TeamStanding.objects.filter(team=team)
+        .select_related("league")
+        .order_by("league__season", "league__name")
+    )
+    totals = {
+        name: sum(getattr(standing, name) for standing in standings)
+        for name in COUNTERS
+    }
+    played = totals["played"]
+
+    def average(name):
+        return round(totals[name] / played, 2) if played else None
+
+    return {
+        "played": played,
+        "wins": totals["wins"],
+        "losses": totals["losses"],
+        "points_for": totals["points_for"],
+        "points_against": totals["points_against"],
+        "averages": {
+            "points_for": average("points_for"),
+            "points_against": average("points_against"),
+            "quarter_1": average("quarter_1_for"),
+            "quarter_2": average("quarter_2_for"),
+            "quarter_3": average("quarter_3_for"),
+            "quarter_4": average("quarter_4_for"),
+            "over_time": average("over_time_for"),
+        },
+        "leagues": standings,
+    }
@@ -0,0 +1,103 @@
+import codecs
+import json
+
+from basket.exceptions import BadRequestException
+
+WHITESPACE = " \t\n\r"
+# Drop consumed text once the buffer grows past this many characters
+COMPACT_THRESHOLD = 1 << 16
+
+
+class _Reader:
+    """Incremental JSON tokenizer over an iterable of byte chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            self.buffer += self.decoder.decode(b"", final=True)
+            return True
+        if self.pos > COMPACT_THRESHOLD:
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+        self.buffer += self.decoder.decode(chunk)
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buffer):
+                if self.buffer[self.pos] not in WHITESPACE:
+                    return self.buffer[self.pos]
+                self.pos += 1
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A value ending exactly at the buffer edge may be a truncated
+            # number or literal, so make sure the next token is available
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_response_items(chunks, key="response"):
+    """Yield the items of the ``key`` array of an API-BASKETBALL body.
+
+    ``chunks`` is any iterable of bytes, such as ``Response.iter_content()``.
+    Items are decoded one at a time so memory use does not depend on the
+    size of the array. A non-empty ``errors`` member raises
+    ``BadRequestException``.
+    """
+    reader = _Reader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() == "]":
+                        reader.pos += 1
+                        break
+                    reader.expect(",")
+        else:
+            value = reader.value()
+            if name == "errors" and value:
+                raise BadRequestException(value)
+        if reader.peek() == "}":
+            return
+        reader.expect(",")
@@ -0,0 +1,87 @@
+"""Synthetic API-BASKETBALL data for benchmarks."""
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+SCORE_KEYS = ("quarter_1", "quarter_2", "quarter_3", "quarter_4")
+
+
+def _score(rng):
+    quarters = {key: rng.randint(10, 35) for key in SCORE_KEYS}
+    return {
+        **quarters,
+        "over_time": None,
+        "total": sum(quarters.values()),
+    }
+
+
+def synthetic_games(
+    count,
+    teams=500,
+    leagues=50,
+    countries=30,
+    seed=0,
+    start=datetime(2023, 1, 1, tzinfo=timezone.utc),
+    first_id=1,
+):
+    """Yield ``count`` game dicts shaped like ``/games`` response items"""
+    rng = random.Random(seed)
+    for offset in range(count):
+        game_id = first_id + offset
+        league_id = rng.randint(1, leagues)
+        country_id = league_id % countries + 1
+        home_id, away_id = rng.sample(range(1, teams + 1), 2)
+        date = start + timedelta(minutes=30 * ((offset + 1) % 20000))
+        yield {
+            "id": game_id,
+            "date": date.isoformat(),
+            "time": date.strftime("%H:%M"),
+            "timestamp": int(date.timestamp()),
+            "timezone": "UTC",
+            "stage": None,
+            "week": None,
+            "status": {"long": "Game Finished", "short": "FT", "timer": None},
+            "league": {
+                "id": league_id,
+                "name": f"League {league_id}",
+                "type": "League",
+                "season": "2022-2023",
+                "logo": f"https://media.example/leagues/{league_id}.png",
+            },
+            "country": {
+                "id": country_id,
+                "name": f"Country {country_id}",
+                "code": f"C{country_id}",
+                "flag": f"https://media.example/flags/{country_id}.svg",
+            },
+            "teams": {
+                "home": {
+                    "id": home_id,
+                    "name": f"Team {home_id}",
+                    "logo": f"https://media.example/teams/{home_id}.png",
+                },
+                "away": {
+                    "id": away_id,
+                    "name": f"Team {away_id}",
+                    "logo": f"https://media.example/teams/{away_id}.png",
+                },
+            },
+            "scores": {"home": _score(rng), "away": _score(rng)},
+        }
+
+
+def synthetic_body(games, chunk_size=64 * 1024):
+    """Encode ``games`` as a ``/games`` response body, chunk by chunk.
+
+    Only one chunk is held at a time, like a body read from the network.
+    """
+    buffer = bytearray(b'{"get": "games", "errors": [], "response": [')
+    for index, game in enumerate(games):
+        if index:
+            buffer += b","
+        buffer += json.dumps(game).encode()
+        while len(buffer) >= chunk_size:
+            yield bytes(buffer[:chunk_size])
+            del buffer[:chunk_size]
+    buffer += b"]}"
+    yield bytes(buffer)
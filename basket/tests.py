@@ -1,24 +1,127 @@
+import asyncio
+import json
+import threading
+from datetime import date, timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from rest_framework.test import APITestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
 
-from basket.models import Country, Game, Profile
+from basket import async_views
+from basket import cache as response_cache
+from basket import metrics, standings
+from basket.admin import EstimatedCountPaginator
+from basket.assignment import (
+    aassign_game,
+    assign_game,
+    bulk_assign,
+    claim_next_game,
+)
+from basket.auth import token_cache
+from basket.benchmarks.fakeapi import FakeRapidAPI, FakeUpstream
+from basket.dates import day_range
+from basket.db.pool import ConnectionPool, PoolTimeout, get_pool
+from basket.exceptions import (
+    BadRequestException,
+    ConflictException,
+    UpstreamException,
+)
+from basket.ingest import ingest_games, refresh_db, upstream_queries
+from basket.jobs import enqueue_refresh, work
+from basket.models import (
+    Country,
+    Game,
+    League,
+    Profile,
+    QuarantinedGame,
+    RefreshJob,
+    Team,
+    TeamStanding,
+)
+from basket.routers import PrimaryReplicaRouter, replica_reads
+from basket.serializers import FastGameSerializer, GameSerializer
+from basket.streaming import iter_response_items
+from basket.synthetic import synthetic_games
+from basket.upstream import AsyncUpstreamClient, UpstreamClient
+from basket.validators import ScoreValidator, StatusValidator, validate_games
 
 User = get_user_model()
 
 
+def game_payload(game_id, home_id=1, away_id=2, league_id=1, country_id=1):
+    """Build a game dict shaped like an API-BASKETBALL response item"""
+    score = {
+        "quarter_1": 20,
+        "quarter_2": 20,
+        "quarter_3": 20,
+        "quarter_4": 20,
+        "over_time": None,
+        "total": 80,
+    }
+    return {
+        "id": game_id,
+        "date": "2023-03-15T19:00:00+00:00",
+        "time": "19:00",
+        "timestamp": 1678906800,
+        "timezone": "UTC",
+        "stage": None,
+        "week": None,
+        "status": {"long": "Game Finished", "short": "FT", "timer": None},
+        "league": {
+            "id": league_id,
+            "name": "Liga",
+            "type": "League",
+            "season": 2023,
+            "logo": None,
+        },
+        "country": {
+            "id": country_id,
+            "name": "Testland",
+            "code": "TL",
+            "flag": None,
+        },
+        "teams": {
+            "home": {"id": home_id, "name": f"Team {home_id}", "logo": None},
+            "away": {"id": away_id, "name": f"Team {away_id}", "logo": None},
+        },
+        "scores": {"home": dict(score), "away": dict(score)},
+    }
+
+
 class TestGames(APITestCase):
     fixtures = ["test_data.json"]
 
     def setUp(self):
-        pass
+        cache.clear()
 
     def authenticate(self, user):
         token = Token.objects.create(user=user)
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
 
+    def fetch_all(self, url):
+        """Follow ``next`` links and return the results of every page"""
+        results = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results.extend(response.json()["results"])
+            url = response.json()["next"]
+        return results
+
     def test_unauthorized(self):
         url = reverse("game-list")
         response = self.client.get(url)
@@ -29,9 +132,8 @@ class TestGames(APITestCase):
         token = Token.objects.create(user=user)
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
         url = reverse("game-list")
-        response = self.client.get(url)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.json()), Game.objects.count())
+        games = self.fetch_all(url)
+        self.assertEqual(len(games), Game.objects.count())
 
     def test_normal_user_sees_only_their_country(self):
         user = User.objects.create(username="normal", is_staff=False)
@@ -56,7 +158,8 @@ class TestGames(APITestCase):
 
         # All Romania games (assigned and unassigned) are returned
         self.assertEqual(
-            len(response.json()), Game.objects.filter(country=romania).count()
+            len(response.json()["results"]),
+            Game.objects.filter(country=romania).count(),
         )
 
     def test_normal_user_does_not_see_games_assigned_to_others(self):
@@ -85,7 +188,7 @@ class TestGames(APITestCase):
 
         # The game assigned to user2 is not in the results
         self.assertEqual(
-            len(response.json()),
+            len(response.json()["results"]),
             Game.objects.filter(country=romania).count() - 1,
         )
 
@@ -111,7 +214,7 @@ class TestGames(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Only the specifically assigned game is returned
-        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(len(response.json()["results"]), 1)
 
     def test_unassigned(self):
         user = User.objects.create(username="normal", is_staff=False)
@@ -136,7 +239,7 @@ class TestGames(APITestCase):
 
         # Only the unassigned games are returned
         self.assertEqual(
-            len(response.json()),
+            len(response.json()["results"]),
             Game.objects.filter(country=romania).count() - 1,
         )
 
@@ -186,3 +289,2001 @@ class TestGames(APITestCase):
         # Game is not assigned to user
         game.refresh_from_db()
         self.assertNotEqual(game.user, user)
+
+    def test_assign_malformed_pk(self):
+        user = User.objects.create(username="normal", is_staff=False)
+        Profile.objects.create(user=user)
+        self.authenticate(user)
+
+        url = reverse("game-assign", kwargs={"pk": "abc"})
+        response = self.client.patch(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        with self.assertRaises(NotFound):
+            async_to_sync(aassign_game)("abc", user)
+
+
+def stored_game_payload(game):
+    """Build the upstream game dict a stored game was synced from"""
+    league, country = game.league, game.country
+    return {
+        "id": game.pk,
+        "date": game.date.isoformat(),
+        "time": game.time,
+        "timestamp": game.timestamp,
+        "timezone": game.timezone,
+        "stage": game.stage,
+        "week": game.week,
+        "status": game.status,
+        "league": {
+            field: getattr(league, field)
+            for field in ("id", "name", "type", "season", "logo")
+        },
+        "country": {
+            field: getattr(country, field)
+            for field in ("id", "name", "code", "flag")
+        },
+        "teams": {
+            side: {
+                field: getattr(team, field) for field in ("id", "name", "logo")
+            }
+            for side, team in (
+                ("home", game.home_team),
+                ("away", game.away_team),
+            )
+        },
+        "scores": {"home": game.home_score, "away": game.away_score},
+    }
+
+
+class TestIngest(TestCase):
+    def test_inserts_and_dedupes_related_objects(self):
+        games = [game_payload(i, home_id=i, away_id=i + 1) for i in range(10)]
+        report = ingest_games(games)
+
+        self.assertEqual(report["league"]["inserted"], 1)
+        self.assertEqual(report["country"]["inserted"], 1)
+        self.assertEqual(report["team"]["inserted"], 11)
+        self.assertEqual(report["game"]["inserted"], 10)
+        self.assertEqual(Game.objects.count(), 10)
+        self.assertEqual(Team.objects.get(pk=1).logo, "")
+        self.assertEqual(League.objects.get(pk=1).season, "2023")
+
+    def test_reingest_reports_changed_and_skipped(self):
+        ingest_games([game_payload(1), game_payload(2)])
+        before = Game.objects.get(pk=1).updated_at
+
+        changed = game_payload(2)
+        changed["scores"]["home"]["total"] = 99
+        report = ingest_games([game_payload(1), changed])
+
+        self.assertEqual(
+            report["game"], {"inserted": 0, "changed": 1, "skipped": 1}
+        )
+        self.assertEqual(
+            report["team"], {"inserted": 0, "changed": 0, "skipped": 2}
+        )
+        self.assertEqual(Game.objects.get(pk=2).home_score["total"], 99)
+        self.assertEqual(Game.objects.get(pk=1).updated_at, before)
+
+    def test_unchanged_payload_is_not_written(self):
+        games = [game_payload(i) for i in range(10)]
+        ingest_games(games)
+
+        # savepoint + one fingerprint lookup per model + release
+        with self.assertNumQueries(6):
+            report = ingest_games(games)
+        self.assertEqual(report["game"]["skipped"], 10)
+
+    def test_only_moved_columns_are_written(self):
+        ingest_games([game_payload(1)])
+
+        changed = game_payload(1)
+        changed["status"] = {"long": "Halftime", "short": "HT", "timer": None}
+        with CaptureQueriesContext(connection) as ctx:
+            report = ingest_games([changed])
+
+        self.assertEqual(report["game"]["changed"], 1)
+        (update,) = [q["sql"] for q in ctx if q["sql"].startswith("UPDATE")]
+        self.assertIn('"status"', update)
+        self.assertNotIn('"home_score"', update)
+        self.assertEqual(Game.objects.get(pk=1).status["short"], "HT")
+
+    def test_query_count_does_not_grow_with_payload(self):
+        small = [game_payload(i, home_id=i, away_id=i + 1) for i in range(5)]
+        large = [
+            game_payload(i, home_id=i, away_id=i + 1, league_id=2, country_id=2)
+            # Small enough for one INSERT under SQLite's 999 parameter limit
+            for i in range(100, 125)
+        ]
+        # savepoint + 4 fingerprint lookups + 4 inserts
+        # + 2 standings aggregates + 1 standings upsert + release
+        with self.assertNumQueries(13):
+            ingest_games(small)
+        with self.assertNumQueries(13):
+            ingest_games(large)
+
+
+class TestRefreshJobs(APITestCase):
+    def authenticate(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+
+    def test_refresh_is_enqueued(self):
+        user = User.objects.create(username="admin", is_staff=True)
+        self.authenticate(user)
+
+        url = reverse("game-list")
+        response = self.client.get(url, {"refresh": True, "date": "2023-03-15"})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        job = RefreshJob.objects.get(pk=response.json()["id"])
+        self.assertEqual(job.status, RefreshJob.Status.QUEUED)
+        self.assertEqual(job.querystring, {"date": "2023-03-15"})
+        self.assertEqual(job.requested_by, user)
+
+    def test_normal_user_cannot_refresh(self):
+        user = User.objects.create(username="normal", is_staff=False)
+        Profile.objects.create(user=user)
+        self.authenticate(user)
+
+        url = reverse("game-list")
+        response = self.client.get(url, {"refresh": True})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(RefreshJob.objects.exists())
+
+    def test_worker_runs_job_and_reports_status(self):
+        user = User.objects.create(username="admin", is_staff=True)
+        job = enqueue_refresh({"date": "2023-03-15"}, user=user)
+        report = {"game": {"inserted": 3, "changed": 0, "skipped": 0}}
+
+        with mock.patch("basket.jobs.refresh_db", return_value=report) as m:
+            self.assertEqual(work("test", once=True), 1)
+        m.assert_called_once_with({"date": "2023-03-15"})
+
+        self.authenticate(user)
+        url = reverse("refreshjob-detail", kwargs={"pk": job.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["status"], RefreshJob.Status.SUCCEEDED)
+        self.assertEqual(data["report"], report)
+        self.assertEqual(data["worker"], "test")
+        self.assertIsNotNone(data["duration"])
+
+    def test_failed_job_records_error(self):
+        job = enqueue_refresh({})
+
+        with mock.patch(
+            "basket.jobs.refresh_db", side_effect=ValueError("boom")
+        ):
+            work("test", once=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, RefreshJob.Status.FAILED)
+        self.assertEqual(job.error, "boom")
+
+    def test_job_is_claimed_once(self):
+        enqueue_refresh({})
+
+        with mock.patch("basket.jobs.refresh_db", return_value={}):
+            self.assertEqual(work("first", once=True), 1)
+            self.assertEqual(work("second", once=True), 0)
+
+    @override_settings(REFRESH_JOB_TIMEOUT=60)
+    def test_abandoned_job_is_requeued(self):
+        job = enqueue_refresh({})
+        RefreshJob.objects.filter(pk=job.pk).update(
+            status=RefreshJob.Status.RUNNING,
+            worker="asgi:1",
+            started_at=timezone.now() - timedelta(seconds=30),
+        )
+        with mock.patch("basket.jobs.refresh_db", return_value={}):
+            self.assertEqual(work("test", once=True), 0)
+
+            RefreshJob.objects.filter(pk=job.pk).update(
+                started_at=timezone.now() - timedelta(seconds=90)
+            )
+            self.assertEqual(work("test", once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, RefreshJob.Status.SUCCEEDED)
+        self.assertEqual(job.worker, "test")
+
+
+class StubUpstream(FakeUpstream):
+    """Replies with the queued ``(status, headers, body)`` tuples in order and
+    repeats the last one when the queue runs out.
+    """
+
+    def __init__(self, *replies):
+        super().__init__(UPSTREAM_BACKOFF_BASE=0.01, UPSTREAM_MAX_RETRIES=2)
+        self.replies = list(replies)
+
+    def reply(self, path, query):
+        if len(self.replies) > 1:
+            return self.replies.pop(0)
+        return self.replies[0]
+
+
+def games_body(*games, errors=None):
+    return {"errors": errors or [], "response": list(games)}
+
+
+class TestUpstreamClient(TestCase):
+    def test_fetch_reuses_connection_and_counts(self):
+        with StubUpstream((200, {}, games_body(game_payload(1)))) as stub:
+            client = UpstreamClient()
+            client.fetch_games({"date": "2023-03-15"})
+            payload = client.fetch_games({"date": "2023-03-16"})
+
+        self.assertEqual(payload["response"][0]["id"], 1)
+        self.assertEqual(stub.connections, 1)
+        path, headers = stub.requests[0]
+        self.assertEqual(path, "/games?date=2023-03-15")
+        self.assertEqual(headers["X-RapidAPI-Key"], "secret")
+        stats = client.stats
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["retries"], 0)
+        self.assertGreater(stats["bytes_received"], 0)
+        self.assertGreater(stats["latency_seconds"], 0)
+
+    def test_retries_server_errors(self):
+        replies = ((503, {}, {}), (200, {}, games_body()))
+        with StubUpstream(*replies) as stub:
+            client = UpstreamClient()
+            client.fetch_games({})
+
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual(client.stats["retries"], 1)
+
+    def test_rate_limit_respects_retry_after(self):
+        replies = ((429, {"Retry-After": "2"}, {}), (200, {}, games_body()))
+        with StubUpstream(*replies):
+            client = UpstreamClient()
+            with mock.patch("basket.upstream.time.sleep") as sleep:
+                client.fetch_games({})
+
+        sleep.assert_called_once_with(2.0)
+
+    def test_gives_up_after_max_retries(self):
+        with StubUpstream((500, {}, {})) as stub:
+            client = UpstreamClient()
+            with self.assertRaises(UpstreamException):
+                client.fetch_games({})
+
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual(client.stats["failures"], 1)
+
+    def test_client_errors_are_not_retried(self):
+        with StubUpstream((403, {}, {})) as stub:
+            with self.assertRaises(UpstreamException):
+                UpstreamClient().fetch_games({})
+
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_refresh_db_against_stub(self):
+        body = games_body(game_payload(1), game_payload(2))
+        with StubUpstream((200, {}, body)):
+            report = refresh_db({"date": "2023-03-15"})
+
+        self.assertEqual(report["game"]["inserted"], 2)
+        self.assertEqual(Game.objects.count(), 2)
+
+
+class TestAsyncUpstreamClient(TestCase):
+    async def test_fetches_days_concurrently_and_retries(self):
+        replies = ((503, {}, {}), (200, {}, games_body(game_payload(1))))
+        with StubUpstream(*replies) as stub:
+            client = AsyncUpstreamClient()
+            payloads = await asyncio.gather(
+                client.fetch_games({"date": "2023-03-15"}),
+                client.fetch_games({"date": "2023-03-16"}),
+            )
+            await client.aclose()
+
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual([p["response"][0]["id"] for p in payloads], [1, 1])
+        self.assertEqual(client.stats["retries"], 1)
+
+    async def test_api_errors_are_raised(self):
+        body = games_body(errors={"date": "Invalid"})
+        with StubUpstream((200, {}, body)):
+            client = AsyncUpstreamClient()
+            with self.assertRaises(BadRequestException):
+                await client.fetch_games({"date": "x"})
+            await client.aclose()
+
+
+class TestStreaming(TestCase):
+    def chunked(self, body, size):
+        data = json.dumps(body).encode()
+        return [data[i : i + size] for i in range(0, len(data), size)]
+
+    def test_items_survive_any_chunk_boundary(self):
+        games = [game_payload(i) for i in range(3)]
+        body = {"get": "games", "errors": [], "results": 3, "response": games}
+        for size in (1, 2, 7, 64, 10000):
+            with self.subTest(size=size):
+                items = list(iter_response_items(self.chunked(body, size)))
+                self.assertEqual(items, games)
+
+    def test_multibyte_characters_split_across_chunks(self):
+        game = game_payload(1)
+        game["league"]["name"] = "Liga Națională"
+        body = json.dumps(
+            {"errors": [], "response": [game]}, ensure_ascii=False
+        )
+        data = body.encode()
+        chunks = [data[i : i + 3] for i in range(0, len(data), 3)]
+        self.assertEqual(list(iter_response_items(chunks)), [game])
+
+    def test_empty_response(self):
+        body = {"errors": [], "response": []}
+        self.assertEqual(list(iter_response_items(self.chunked(body, 4))), [])
+
+    def test_errors_raise(self):
+        body = {"errors": {"token": "Missing"}, "response": []}
+        with self.assertRaises(BadRequestException):
+            list(iter_response_items(self.chunked(body, 4)))
+
+    def test_stream_ingest_in_batches(self):
+        games = [game_payload(i, home_id=i % 4, away_id=4) for i in range(10)]
+        with StubUpstream((200, {}, games_body(*games))):
+            client = UpstreamClient()
+            report = ingest_games(client.stream_games({}), batch_size=3)
+
+        self.assertEqual(report["game"]["inserted"], 10)
+        self.assertEqual(report["team"]["inserted"], 5)
+        self.assertEqual(report["league"]["inserted"], 1)
+        self.assertGreater(client.stats["bytes_received"], 0)
+        self.assertEqual(Game.objects.count(), 10)
+
+
+@override_settings(GAMES_CACHE_TIMEOUT=0)
+class QueryBudgetTestCase(APITestCase):
+    """Asserts that an endpoint's query count does not depend on row count.
+
+    The response cache is disabled so every request does the full work,
+    including the visibility scope lookup that is normally cached.
+    """
+
+    fixtures = ["test_data.json"]
+
+    def authenticate(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+
+    def add_games(self, country, count):
+        template = country.games.first()
+        next_id = Game.objects.order_by("-id").values_list("id", flat=True)[0]
+        Game.objects.bulk_create(
+            [
+                Game(
+                    id=next_id + i + 1,
+                    date=template.date,
+                    time=template.time,
+                    timestamp=template.timestamp,
+                    timezone=template.timezone,
+                    league=template.league,
+                    country=country,
+                    status=template.status,
+                    home_team=template.home_team,
+                    away_team=template.away_team,
+                    home_score=template.home_score,
+                    away_score=template.away_score,
+                )
+                for i in range(count)
+            ]
+        )
+
+    def assertQueryBudget(self, budget, request, grow):
+        """Run ``request`` before and after ``grow`` adds rows.
+
+        Both runs must cost the same number of queries, at most ``budget``.
+        A first, unmeasured request warms up the token cache.
+        """
+        request()
+        with CaptureQueriesContext(connection) as before:
+            response = request()
+        self.assertLess(response.status_code, 400)
+        grow()
+        with CaptureQueriesContext(connection) as after:
+            response = request()
+        self.assertLess(response.status_code, 400)
+        self.assertEqual(
+            len(before),
+            len(after),
+            "Query count grew with the number of rows:\n"
+            + "\n".join(q["sql"] for q in after),
+        )
+        self.assertLessEqual(len(after), budget)
+
+
+class TestQueryBudgets(QueryBudgetTestCase):
+    def setUp(self):
+        self.romania = Country.objects.get(code="RO")
+        self.admin = User.objects.create(username="admin", is_staff=True)
+        self.user = User.objects.create(username="normal", is_staff=False)
+        profile = Profile.objects.create(user=self.user)
+        profile.countries.add(self.romania)
+
+    def grow(self):
+        self.add_games(self.romania, 25)
+
+    def test_list(self):
+        for user in (self.admin, self.user):
+            with self.subTest(user=user.username):
+                self.authenticate(user)
+                self.assertQueryBudget(
+                    3, lambda: self.client.get(reverse("game-list")), self.grow
+                )
+
+    def test_assigned_and_unassigned(self):
+        game = self.romania.games.first()
+        game.user = self.user
+        game.save()
+        self.authenticate(self.user)
+        for name in ("game-assigned", "game-unassigned"):
+            with self.subTest(action=name):
+                self.assertQueryBudget(
+                    3, lambda: self.client.get(reverse(name)), self.grow
+                )
+
+    def test_ndjson_stream(self):
+        def stream():
+            response = self.client.get(
+                reverse("game-list"), {"format": "ndjson"}
+            )
+            response.lines = b"".join(response.streaming_content).splitlines()
+            return response
+
+        self.authenticate(self.user)
+        self.assertQueryBudget(3, stream, self.grow)
+
+    def test_retrieve(self):
+        game = self.romania.games.first()
+        self.authenticate(self.user)
+        url = reverse("game-detail", kwargs={"pk": game.pk})
+        self.assertQueryBudget(3, lambda: self.client.get(url), self.grow)
+
+    def test_assign(self):
+        game = self.romania.games.first()
+        self.authenticate(self.user)
+        url = reverse("game-assign", kwargs={"pk": game.pk})
+        self.assertQueryBudget(3, lambda: self.client.patch(url), self.grow)
+
+
+class TestPagination(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username="admin", is_staff=True)
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+        self.user = user
+
+    def test_pages_follow_date_then_id(self):
+        url = reverse("game-list") + "?page_size=7"
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data["results"]), 7)
+            ids.extend(game["id"] for game in data["results"])
+            url = data["next"]
+
+        expected = list(
+            Game.objects.order_by("date", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_previous_page(self):
+        url = reverse("game-list") + "?page_size=5"
+        first = self.client.get(url).json()
+        second = self.client.get(first["next"]).json()
+        third = self.client.get(second["next"]).json()
+        back = self.client.get(third["previous"]).json()
+
+        self.assertIsNone(first["previous"])
+        self.assertEqual(back["results"], second["results"])
+
+    def test_page_size_is_capped(self):
+        with override_settings(GAMES_MAX_PAGE_SIZE=10):
+            data = self.client.get(reverse("game-list"), {"page_size": 500})
+        self.assertEqual(len(data.json()["results"]), 10)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("game-list"), {"cursor": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_custom_actions_are_paginated(self):
+        url = reverse("game-unassigned") + "?page_size=100"
+        first = self.client.get(url).json()
+        second = self.client.get(first["next"]).json()
+
+        self.assertEqual(len(first["results"]), 100)
+        self.assertEqual(len(second["results"]), Game.objects.count() - 100)
+        self.assertIsNone(second["next"])
+
+    def test_later_pages_cost_the_same(self):
+        url = reverse("game-list") + "?page_size=10"
+        with CaptureQueriesContext(connection) as first_page:
+            data = self.client.get(url).json()
+        for _ in range(8):
+            data = self.client.get(data["next"]).json()
+        with CaptureQueriesContext(connection) as last_page:
+            self.client.get(data["next"])
+        self.assertEqual(len(first_page), len(last_page))
+        self.assertNotIn("OFFSET", last_page[-1]["sql"])
+
+
+class TestNDJSON(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.create(username="admin", is_staff=True)
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+
+    def read_lines(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content)
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_format_parameter_streams_every_game(self):
+        response = self.client.get(reverse("game-list"), {"format": "ndjson"})
+        games = self.read_lines(response)
+
+        expected = list(
+            Game.objects.order_by("date", "id").values_list("id", flat=True)
+        )
+        self.assertEqual([game["id"] for game in games], expected)
+        self.assertIn("teams", games[0])
+
+    def test_accept_header(self):
+        response = self.client.get(
+            reverse("game-unassigned"), HTTP_ACCEPT="application/x-ndjson"
+        )
+        self.assertEqual(len(self.read_lines(response)), Game.objects.count())
+
+    def test_lines_match_json_representation(self):
+        game = Game.objects.order_by("date", "id").first()
+        response = self.client.get(
+            reverse("game-list"),
+            {"format": "ndjson", "date": game.date.date().isoformat()},
+        )
+        line = self.read_lines(response)[0]
+        detail = self.client.get(reverse("game-detail", kwargs={"pk": game.pk}))
+        self.assertEqual(line, detail.json())
+
+
+class TestFastGameSerializer(TestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_output_is_byte_identical(self):
+        user = User.objects.create(username="normal")
+        Game.objects.filter(pk=Game.objects.first().pk).update(user=user)
+        # Upstream nulls and integer seasons/timestamps
+        ingest_games([game_payload(1)])
+        games = Game.objects.order_by("id")
+
+        renderer = JSONRenderer()
+        expected = renderer.render(GameSerializer(games, many=True).data)
+        actual = renderer.render(list(FastGameSerializer().serialize(games)))
+        self.assertEqual(actual, expected)
+
+    def test_list_matches_detail(self):
+        admin = User.objects.create(username="admin", is_staff=True)
+        token = Token.objects.create(user=admin)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {token.key}"}
+        listed = self.client.get(reverse("game-list"), **auth).json()
+        game = listed["results"][0]
+        url = reverse("game-detail", kwargs={"pk": game["id"]})
+        self.assertEqual(self.client.get(url, **auth).json(), game)
+
+
+class TestResponseCache(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.romania = Country.objects.get(code="RO")
+        self.users = []
+        for name in ("first", "second"):
+            user = User.objects.create(username=name)
+            Profile.objects.create(user=user).countries.add(self.romania)
+            self.users.append(user)
+        self.tokens = {
+            user: Token.objects.create(user=user).key for user in self.users
+        }
+
+    def get(self, user, name="game-list", **params):
+        return self.client.get(
+            reverse(name),
+            params,
+            HTTP_AUTHORIZATION=f"Bearer {self.tokens[user]}",
+        )
+
+    def ids(self, response):
+        return {game["id"] for game in response.json()["results"]}
+
+    def test_users_with_same_countries_share_entries(self):
+        first, second = self.users
+        self.get(first)
+        before = response_cache.stats()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get(second)
+        after = response_cache.stats()
+
+        self.assertEqual(after["hits"], before["hits"] + 1)
+        self.assertEqual(
+            len(response.json()["results"]), self.romania.games.count()
+        )
+        # Token lookup plus the scope of the second user, no game queries
+        self.assertFalse(
+            any(
+                "basket_game" in q["sql"]
+                and 'user_id" =' not in q["sql"]
+                and "LIMIT" in q["sql"]
+                and "ORDER BY" in q["sql"]
+                for q in ctx
+            )
+        )
+
+    def test_assignment_invalidates_lists(self):
+        first, second = self.users
+        self.get(first)
+        self.get(second)
+
+        game = self.romania.games.first()
+        game.user = first
+        game.save()
+
+        self.assertIn(game.pk, self.ids(self.get(first)))
+        self.assertNotIn(game.pk, self.ids(self.get(second)))
+        self.assertIn(game.pk, self.ids(self.get(first, "game-assigned")))
+
+    def test_user_deletion_frees_cached_games(self):
+        first, second = self.users
+        game = self.romania.games.first()
+        game.user = first
+        game.save()
+        self.assertNotIn(
+            game.pk,
+            self.ids(self.get(second, "game-unassigned", page_size=1000)),
+        )
+
+        # Games are freed by a bulk UPDATE that sends no Game signals
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        self.assertIn(
+            game.pk,
+            self.ids(self.get(second, "game-unassigned", page_size=1000)),
+        )
+
+    def test_profile_countries_change_invalidates_scope(self):
+        first, _ = self.users
+        self.get(first)
+        spain = Country.objects.get(code="ES")
+        first.profile.countries.add(spain)
+
+        ids = self.ids(self.get(first, page_size=1000))
+        self.assertTrue(spain.games.filter(pk__in=ids).exists())
+
+    def test_ingest_invalidates_changed_countries(self):
+        first, _ = self.users
+        game = self.romania.games.first()
+        self.get(first)
+
+        payload = stored_game_payload(game)
+        payload["scores"]["home"]["total"] = 123
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_games([payload])
+
+        results = self.get(first).json()["results"]
+        (cached,) = [g for g in results if g["id"] == game.pk]
+        self.assertEqual(cached["scores"]["home"]["total"], 123)
+
+    def test_stats(self):
+        first, _ = self.users
+        before = response_cache.stats()
+        self.get(first)
+        self.get(first)
+        after = response_cache.stats()
+        self.assertEqual(after["misses"], before["misses"] + 1)
+        self.assertEqual(after["hits"], before["hits"] + 1)
+        self.assertGreater(after["hit_rate"], 0)
+
+
+class TestConditionalGet(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username="admin", is_staff=True)
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+
+    def test_list_not_modified(self):
+        url = reverse("game-list")
+        response = self.client.get(url)
+        self.assertIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(again["ETag"], response["ETag"])
+        self.assertFalse(any("ORDER BY" in q["sql"] for q in ctx))
+
+    def test_cached_page_keeps_its_validators(self):
+        url = reverse("game-list")
+        response = self.client.get(url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(url)
+        self.assertEqual(again["ETag"], response["ETag"])
+        self.assertFalse(any("MAX(" in q["sql"] for q in ctx))
+
+    def test_if_modified_since(self):
+        game = Game.objects.filter(user=None).first()
+        url = reverse("game-detail", kwargs={"pk": game.pk})
+        response = self.client.get(url)
+        again = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A game leaving a list makes none of the remaining rows newer,
+        # so lists cannot be answered by date
+        url = reverse("game-unassigned") + "?page_size=1000"
+        count = len(self.client.get(url).json()["results"])
+        game.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), count - 1)
+
+    def test_changed_game_changes_etag(self):
+        url = reverse("game-list")
+        etag = self.client.get(url)["ETag"]
+        game = Game.objects.first()
+        game.week = "1"
+        game.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_changed_team_changes_etag(self):
+        url = reverse("game-list")
+        etag = self.client.get(url)["ETag"]
+        team = Game.objects.first().home_team
+        team.name = "Renamed"
+        team.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_not_modified(self):
+        game = Game.objects.first()
+        url = reverse("game-detail", kwargs={"pk": game.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.json()["id"], game.pk)
+
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other = Game.objects.exclude(pk=game.pk).first()
+        other_url = reverse("game-detail", kwargs={"pk": other.pk})
+        response = self.client.get(other_url, HTTP_IF_NONE_MATCH=again["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_missing_detail_is_still_not_found(self):
+        url = reverse("game-detail", kwargs={"pk": 1})
+        self.assertEqual(
+            self.client.get(url).status_code, status.HTTP_404_NOT_FOUND
+        )
+
+    def test_malformed_detail_pk_is_not_found(self):
+        url = reverse("game-detail", kwargs={"pk": "abc"})
+        self.assertEqual(
+            self.client.get(url).status_code, status.HTTP_404_NOT_FOUND
+        )
+
+
+class TestTokenCache(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create(username="normal")
+        self.profile = Profile.objects.create(user=self.user)
+        self.romania = Country.objects.get(code="RO")
+        self.profile.countries.add(self.romania)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.key}")
+        self.url = reverse("game-detail", kwargs={"pk": 1})
+
+    def auth_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        return [q["sql"] for q in ctx if "authtoken_token" in q["sql"]]
+
+    def test_second_request_skips_token_lookup(self):
+        self.assertEqual(len(self.auth_queries()), 1)
+        self.assertEqual(self.auth_queries(), [])
+        self.assertEqual(token_cache.stats()["hits"], 1)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_change_is_picked_up(self):
+        spain_game = Country.objects.get(code="ES").games.first()
+        url = reverse("game-detail", kwargs={"pk": spain_game.pk})
+        self.assertEqual(
+            self.client.get(url).status_code, status.HTTP_404_NOT_FOUND
+        )
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_country_change_is_picked_up(self):
+        self.client.get(self.url)
+        spain = Country.objects.get(code="ES")
+        self.profile.countries.add(spain)
+        self.assertEqual(len(self.auth_queries()), 1)
+
+        url = reverse("game-detail", kwargs={"pk": spain.games.first().pk})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_ttl_and_size(self):
+        with override_settings(AUTH_TOKEN_CACHE_TTL=0):
+            self.client.get(self.url)
+            self.assertEqual(len(self.auth_queries()), 1)
+
+        with override_settings(AUTH_TOKEN_CACHE_SIZE=1):
+            other = Token.objects.create(
+                user=User.objects.create(username="other")
+            )
+            self.client.get(self.url)
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {other.key}")
+            self.client.get(self.url)
+            self.assertEqual(token_cache.stats()["size"], 1)
+            self.assertGreaterEqual(token_cache.stats()["evictions"], 1)
+
+
+@override_settings(METRICS_ENABLED=True)
+class TestMetrics(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+        user = User.objects.create(username="normal")
+        profile = Profile.objects.create(user=user)
+        profile.countries.add(Country.objects.get(code="RO"))
+        token = Token.objects.create(user=user)
+        self.authorization = f"Bearer {token.key}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization)
+
+    def test_server_timing_breaks_down_request(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("game-list"))
+        timing = response["Server-Timing"]
+        phases = [entry.split(";")[0] for entry in timing.split(", ")]
+        self.assertEqual(phases, ["db", "auth", "serialize", "render", "total"])
+        self.assertIn(f'desc="{len(ctx)} queries"', timing)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("game-list"))
+        self.client.get(reverse("game-list"))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn(
+            'basket_request_duration_seconds_count{view="game-list",'
+            'method="GET",status="200"} 2',
+            body,
+        )
+        # The second response came from the response cache
+        self.assertIn(
+            'basket_request_phase_seconds_count{view="game-list",'
+            'phase="serialize"} 1',
+            body,
+        )
+        self.assertIn("basket_token_cache_hits_total 1", body)
+        self.assertIn("basket_response_cache_hits_total", body)
+
+    def test_async_views_are_timed(self):
+        # The test connection was opened before the middleware connected
+        # its connection_created receiver
+        metrics.instrument(connection)
+
+        async def get():
+            return await self.async_client.get(
+                reverse("async-game-list"), AUTHORIZATION=self.authorization
+            )
+
+        timing = async_to_sync(get)()["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn("serialize;dur=", timing)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse("game-list"))
+        self.assertNotIn("Server-Timing", response)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram("test", "Test.", ("view",), (1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value, "a")
+        self.assertEqual(
+            histogram.expose()[2:],
+            [
+                'test_bucket{view="a",le="1"} 2',
+                'test_bucket{view="a",le="5"} 3',
+                'test_bucket{view="a",le="+Inf"} 4',
+                'test_sum{view="a"} 14.5',
+                'test_count{view="a"} 4',
+            ],
+        )
+
+
+class TestAsyncViews(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create(username="normal")
+        profile = Profile.objects.create(user=self.user)
+        profile.countries.add(Country.objects.get(code="RO"))
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.key}")
+        self.game = Country.objects.get(code="RO").games.first()
+
+    def async_request(self, method, path, token=None, **data):
+        headers = {}
+        if token is not False:
+            headers["AUTHORIZATION"] = f"Bearer {(token or self.token).key}"
+
+        async def send():
+            return await getattr(self.async_client, method)(
+                path, data, **headers
+            )
+
+        return async_to_sync(send)()
+
+    def test_list_matches_sync_view(self):
+        url = reverse("game-list") + "?page_size=2"
+        expected = self.client.get(url).json()
+        response = self.async_request(
+            "get", reverse("async-game-list"), page_size=2
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["results"], expected["results"])
+        self.assertIn("/async/games/?", data["next"])
+
+    def test_detail_matches_sync_view(self):
+        expected = self.client.get(
+            reverse("game-detail", kwargs={"pk": self.game.pk})
+        ).json()
+        response = self.async_request(
+            "get", reverse("async-game-detail", kwargs={"pk": self.game.pk})
+        )
+        self.assertEqual(response.json(), expected)
+
+        spain_game = Country.objects.get(code="ES").games.first()
+        response = self.async_request(
+            "get", reverse("async-game-detail", kwargs={"pk": spain_game.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_assign(self):
+        url = reverse("async-game-assign", kwargs={"pk": self.game.pk})
+        response = self.async_request("patch", url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["id"], self.game.pk)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.user, self.user)
+
+        other = User.objects.create(username="other")
+        Profile.objects.create(user=other).countries.add(self.game.country)
+        response = self.async_request(
+            "patch", url, token=Token.objects.create(user=other)
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_authentication_and_methods(self):
+        response = self.async_request(
+            "get", reverse("async-game-list"), token=False
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response["WWW-Authenticate"], "Bearer")
+        response = self.async_request(
+            "get", reverse("async-game-assign", kwargs={"pk": self.game.pk})
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+    async def test_refresh_runs_in_process(self):
+        admin = await User.objects.acreate(username="admin", is_staff=True)
+        token = await Token.objects.acreate(user=admin)
+        with FakeRapidAPI(games_per_day=3):
+            response = await self.async_client.get(
+                reverse("async-game-list"),
+                {
+                    "refresh": "true",
+                    "date_from": "2023-03-15",
+                    "date_to": "2023-03-16",
+                },
+                AUTHORIZATION=f"Bearer {token.key}",
+            )
+            await asyncio.gather(*async_views.background_tasks)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = await RefreshJob.objects.aget(pk=response.json()["id"])
+        self.assertEqual(job.status, RefreshJob.Status.SUCCEEDED)
+        self.assertEqual(job.report["game"]["inserted"], 6)
+        self.assertTrue(job.worker.startswith("asgi:"))
+
+
+class TestAssignment(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.romania = Country.objects.get(code="RO")
+        self.users = []
+        for name in ("first", "second"):
+            user = User.objects.create(username=name)
+            Profile.objects.create(user=user).countries.add(self.romania)
+            self.users.append(user)
+        self.game = self.romania.games.filter(user=None).first()
+        self.url = reverse("game-assign", kwargs={"pk": self.game.pk})
+
+    def patch(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+        return self.client.patch(self.url)
+
+    def test_game_held_by_someone_else_conflicts(self):
+        first, second = self.users
+        self.assertEqual(self.patch(first).status_code, status.HTTP_200_OK)
+        response = self.patch(second)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.user, first)
+
+    def test_reassigning_own_game_is_a_no_op(self):
+        first, _ = self.users
+        self.patch(first)
+        response = self.patch(first)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["user"], first.pk)
+
+    def test_user_can_hold_several_games(self):
+        first, _ = self.users
+        games = self.romania.games.filter(user=None)[:2]
+        for game in games:
+            assign_game(game.pk, first)
+        self.assertEqual(first.games.count(), 2)
+
+    def test_single_update_statement(self):
+        first, _ = self.users
+        with CaptureQueriesContext(connection) as ctx:
+            assign_game(self.game.pk, first)
+        writes = [q["sql"] for q in ctx if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('"user_id" IS NULL', writes[0])
+
+
+class TestClaimNext(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.romania = Country.objects.get(code="RO")
+        self.user = User.objects.create(username="normal")
+        Profile.objects.create(user=self.user).countries.add(self.romania)
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+        self.url = reverse("game-claim-next")
+
+    def test_claims_earliest_unassigned_game(self):
+        expected = self.romania.games.filter(user=None).order_by("date", "id")
+        first, second = expected[:2]
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["id"], first.pk)
+        self.assertEqual(response.json()["user"], self.user.pk)
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.json()["id"], second.pk)
+
+    def test_filters(self):
+        league = self.romania.games.first().league
+        response = self.client.post(self.url + f"?league={league.pk}")
+        game = Game.objects.get(pk=response.json()["id"])
+        self.assertEqual(game.league, league)
+        self.assertEqual(game.country, self.romania)
+
+    def test_nothing_left_to_claim(self):
+        Game.objects.filter(country=self.romania).update(user=self.user)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_only_post_is_allowed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+        response = self.client.post(reverse("game-list"))
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+
+class TestBulkAssign(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.romania = Country.objects.get(code="RO")
+        self.spain = Country.objects.get(code="ES")
+        self.user = User.objects.create(username="normal")
+        Profile.objects.create(user=self.user).countries.add(self.romania)
+        self.admin = User.objects.create(username="admin", is_staff=True)
+        token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+        self.url = reverse("game-bulk-assign")
+
+    def test_report(self):
+        romanian = list(self.romania.games.values_list("pk", flat=True))
+        spanish = self.spain.games.first().pk
+        Game.objects.filter(pk=romanian[0]).update(user=self.user)
+
+        response = self.client.patch(
+            self.url,
+            {"games": [*romanian, spanish, 999999], "user": self.user.pk},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {r["id"]: r["result"] for r in response.json()["results"]}
+        self.assertEqual(results[romanian[0]], "unchanged")
+        self.assertEqual(results[romanian[1]], "assigned")
+        self.assertEqual(results[spanish], "forbidden")
+        self.assertEqual(results[999999], "not_found")
+        self.assertEqual(
+            response.json()["counts"]["assigned"], len(romanian) - 1
+        )
+        self.assertEqual(self.user.games.count(), len(romanian))
+
+    def test_unassign(self):
+        games = list(self.romania.games.values_list("pk", flat=True))
+        bulk_assign(games, self.user)
+        response = self.client.patch(
+            self.url, {"games": games, "user": None}, format="json"
+        )
+        self.assertEqual(response.json()["counts"]["unassigned"], len(games))
+        self.assertFalse(self.user.games.exists())
+
+    def test_admin_only(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+        response = self.client.patch(
+            self.url, {"games": [1], "user": self.user.pk}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_payload(self):
+        response = self.client.patch(
+            self.url, {"games": [], "user": 999999}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.json()), {"games", "user"})
+
+    def test_admin_actions(self):
+        self.client.force_login(User.objects.create_superuser("root"))
+        games = list(self.romania.games.values_list("pk", flat=True))
+        url = reverse("admin:basket_game_changelist")
+        self.client.post(
+            url,
+            {
+                "action": "assign_to_user",
+                "index": 0,
+                "_selected_action": games,
+                "user": self.user.pk,
+            },
+        )
+        self.assertEqual(self.user.games.count(), len(games))
+
+        self.client.post(
+            url, {"action": "unassign", "index": 0, "_selected_action": games}
+        )
+        self.assertFalse(self.user.games.exists())
+
+
+class TestBulkAssignQueries(TestCase):
+    def test_query_count_does_not_grow(self):
+        ingest_games(synthetic_games(1000))
+        user = User.objects.create(username="normal")
+        profile = Profile.objects.create(user=user)
+        profile.countries.set(Country.objects.all())
+        game_ids = list(Game.objects.values_list("pk", flat=True))
+
+        with CaptureQueriesContext(connection) as ctx:
+            results = bulk_assign(game_ids, user)
+        self.assertEqual(
+            {r["result"] for r in results}, {"assigned"}, results[:5]
+        )
+        self.assertEqual(user.games.count(), 1000)
+        # Savepoint, lookup, countries, update, release
+        self.assertLessEqual(len(ctx), 5)
+
+
+class TestConcurrentAssignment(TransactionTestCase):
+    fixtures = ["test_data.json"]
+    threads = 8
+
+    def test_exactly_one_winner(self):
+        romania = Country.objects.get(code="RO")
+        users = []
+        for i in range(self.threads):
+            user = User.objects.create(username=f"user{i}")
+            Profile.objects.create(user=user).countries.add(romania)
+            users.append(user)
+        game = romania.games.filter(user=None).first()
+
+        barrier = threading.Barrier(self.threads)
+        outcomes = []
+
+        def contend(user):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        assign_game(game.pk, user)
+                    except OperationalError:
+                        # In-memory SQLite reports a locked table instead of
+                        # waiting for the other writer; the UPDATE did not run
+                        if connection.vendor != "sqlite":
+                            raise
+                        continue
+                    except ConflictException:
+                        outcomes.append("conflict")
+                    else:
+                        outcomes.append(user)
+                    break
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=contend, args=(user,)) for user in users
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        winners = [outcome for outcome in outcomes if outcome != "conflict"]
+        self.assertEqual(len(outcomes), self.threads)
+        self.assertEqual(len(winners), 1)
+        game.refresh_from_db()
+        self.assertEqual(game.user, winners[0])
+
+    def test_concurrent_claims_get_different_games(self):
+        # The only country with more games than threads
+        usa = Country.objects.get(code="US")
+        users = []
+        for i in range(self.threads):
+            user = User.objects.create(username=f"user{i}")
+            Profile.objects.create(user=user).countries.add(usa)
+            users.append(user)
+
+        barrier = threading.Barrier(self.threads)
+        claimed = []
+
+        def claim(user):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        game = claim_next_game(user)
+                    except OperationalError:
+                        if connection.vendor != "sqlite":
+                            raise
+                        continue
+                    if game is not None:
+                        claimed.append(game.pk)
+                    break
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=claim, args=(user,)) for user in users
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(len(claimed), self.threads)
+        self.assertEqual(len(set(claimed)), self.threads)
+        self.assertEqual(
+            Game.objects.filter(pk__in=claimed)
+            .values("user")
+            .distinct()
+            .count(),
+            self.threads,
+        )
+
+
+class TestIndexes(TestCase):
+    """The hot list queries are served by the indexes in Game.Meta"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ingest_games(synthetic_games(2000))
+        cls.user = User.objects.create(username="normal")
+        Game.objects.filter(pk__lte=200).update(user=cls.user)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, index):
+        if connection.vendor == "postgresql":
+            # Test tables are small enough for a sequential scan to win
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+
+    def page(self, queryset):
+        return queryset.order_by("date", "id")[:100]
+
+    def test_visible_games(self):
+        games = Game.objects.filter(country__in=[1, 2, 3]).filter(
+            Q(user=None) | Q(user=self.user)
+        )
+        self.assertUsesIndex(self.page(games), "game_country_date_idx")
+
+    def test_unassigned_games(self):
+        games = Game.objects.filter(country__in=[1, 2, 3], user=None)
+        self.assertUsesIndex(self.page(games), "game_unassigned_idx")
+
+    def test_assigned_games(self):
+        games = Game.objects.filter(user=self.user)
+        self.assertUsesIndex(self.page(games), "game_user_date_idx")
+
+    def test_league_filter(self):
+        games = Game.objects.filter(league=3)
+        self.assertUsesIndex(self.page(games), "game_league_date_idx")
+
+    def test_season_filter(self):
+        games = Game.objects.filter(league__season="2022-2023")
+        self.assertUsesIndex(self.page(games), "league_season_idx")
+
+    def test_date_filter(self):
+        start, end = day_range("2023-01-02")
+        games = Game.objects.filter(date__gte=start, date__lt=end)
+        self.assertUsesIndex(games, "game_date_id_idx")
+
+
+class TestDateFilter(APITestCase):
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username="admin", is_staff=True)
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+
+    def test_matches_whole_day(self):
+        day = Game.objects.first().date.date()
+        response = self.client.get(
+            reverse("game-list"), {"date": day.isoformat(), "page_size": 1000}
+        )
+        ids = {game["id"] for game in response.json()["results"]}
+        expected = set(
+            Game.objects.filter(date__date=day).values_list("pk", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_invalid_date(self):
+        response = self.client.get(reverse("game-list"), {"date": "2023-13-45"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def ids(self, **params):
+        response = self.client.get(
+            reverse("game-list"), {**params, "page_size": 1000}
+        )
+        return {game["id"] for game in response.json()["results"]}
+
+    def test_date_range_is_inclusive(self):
+        # Spread the fixture games, all played the same day, over 5 days
+        for game in Game.objects.all():
+            game.date += timedelta(days=game.pk % 5, hours=23)
+            Game.objects.filter(pk=game.pk).update(date=game.date)
+        day = Game.objects.order_by("date").first().date.date()
+        first, last = day + timedelta(days=1), day + timedelta(days=3)
+        expected = set(
+            Game.objects.filter(
+                date__date__gte=first, date__date__lte=last
+            ).values_list("pk", flat=True)
+        )
+        self.assertLess(len(expected), Game.objects.count())
+        self.assertEqual(
+            self.ids(date_from=first.isoformat(), date_to=last.isoformat()),
+            expected,
+        )
+
+    def test_open_ended_range(self):
+        first = Game.objects.order_by("date").first().date.date()
+        self.assertEqual(
+            self.ids(date_from=first.isoformat()),
+            set(Game.objects.values_list("pk", flat=True)),
+        )
+
+    def test_team_filter(self):
+        team = Game.objects.first().home_team
+        # Make the team play an away game too
+        away = Game.objects.exclude(home_team=team).first()
+        Game.objects.filter(pk=away.pk).update(away_team=team)
+        expected = set(
+            Game.objects.filter(
+                Q(home_team=team) | Q(away_team=team)
+            ).values_list("pk", flat=True)
+        )
+        self.assertIn(away.pk, expected)
+        self.assertLess(len(expected), Game.objects.count())
+        self.assertEqual(self.ids(team=team.pk), expected)
+
+        response = self.client.get(reverse("game-list"), {"team": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_status_filter(self):
+        expected = set(
+            Game.objects.filter(status__short="AOT").values_list(
+                "pk", flat=True
+            )
+        )
+        self.assertEqual(len(expected), 2)
+        self.assertEqual(self.ids(status="AOT"), expected)
+        self.assertEqual(len(self.ids(status="FT,AOT")), Game.objects.count())
+
+    def test_timestamp_is_an_integer(self):
+        response = self.client.get(reverse("game-list"))
+        self.assertIsInstance(response.json()["results"][0]["timestamp"], int)
+
+
+class TestRangeRefresh(TestCase):
+    def test_one_upstream_query_per_day(self):
+        queries = upstream_queries(
+            {"date_from": "2023-03-30", "date_to": "2023-04-02", "league": 12}
+        )
+        self.assertEqual(
+            [query["date"] for query in queries],
+            ["2023-03-30", "2023-03-31", "2023-04-01", "2023-04-02"],
+        )
+        self.assertTrue(all(query["league"] == 12 for query in queries))
+        self.assertNotIn("date_from", queries[0])
+
+    @override_settings(REFRESH_MAX_DAYS=3)
+    def test_range_is_limited(self):
+        with self.assertRaises(BadRequestException):
+            upstream_queries(
+                {"date_from": "2023-03-01", "date_to": "2023-03-04"}
+            )
+        with self.assertRaises(BadRequestException):
+            upstream_queries(
+                {"date_from": "2023-03-04", "date_to": "2023-03-01"}
+            )
+
+    def test_refresh_ingests_every_day(self):
+        replies = [
+            (200, {}, games_body(game_payload(i, home_id=1, away_id=2)))
+            for i in (1, 2)
+        ]
+        with StubUpstream(*replies) as stub:
+            report = refresh_db(
+                {"date_from": "2023-03-15", "date_to": "2023-03-16"}
+            )
+        self.assertEqual(
+            [path for path, _ in stub.requests],
+            ["/games?date=2023-03-15", "/games?date=2023-03-16"],
+        )
+        self.assertEqual(report["game"]["inserted"], 2)
+
+    def test_fake_rapidapi_serves_distinct_days(self):
+        with FakeRapidAPI(games_per_day=5) as fake:
+            report = refresh_db(
+                {"date_from": "2023-03-15", "date_to": "2023-03-16"}
+            )
+            again = refresh_db({"date": "2023-03-16"})
+        self.assertEqual(len(fake.requests), 3)
+        self.assertEqual(report["game"]["inserted"], 10)
+        self.assertEqual(
+            again["game"], {"inserted": 0, "changed": 0, "skipped": 5}
+        )
+        self.assertEqual(
+            set(Game.objects.dates("date", "day")),
+            {date(2023, 3, 15), date(2023, 3, 16)},
+        )
+
+    def test_invalid_range_is_rejected_before_enqueueing(self):
+        admin = User.objects.create(username="admin", is_staff=True)
+        token = Token.objects.create(user=admin)
+        response = self.client.get(
+            reverse("game-list"),
+            {
+                "refresh": True,
+                "date_from": "2023-03-04",
+                "date_to": "2023-03-01",
+            },
+            HTTP_AUTHORIZATION=f"Bearer {token.key}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RefreshJob.objects.exists())
+
+
+def scored_payload(game_id, home_id, away_id, home, away, **kwargs):
+    """A finished game where each side scored ``home``/``away`` points"""
+    payload = game_payload(game_id, home_id=home_id, away_id=away_id, **kwargs)
+    for side, total in (("home", home), ("away", away)):
+        quarter = total // 4
+        payload["scores"][side] = {
+            "quarter_1": quarter,
+            "quarter_2": quarter,
+            "quarter_3": quarter,
+            "quarter_4": str(total - 3 * quarter),
+            "over_time": None,
+            "total": total,
+        }
+    return payload
+
+
+class TestStandings(APITestCase):
+    def setUp(self):
+        ingest_games(
+            [
+                scored_payload(1, 1, 2, 90, 80),
+                scored_payload(2, 2, 3, 70, 75),
+                scored_payload(3, 3, 1, 60, 100),
+            ]
+        )
+        self.league = League.objects.get(pk=1)
+        user = User.objects.create(username="normal")
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.key}")
+
+    def table(self):
+        return {
+            row.team_id: (row.played, row.wins, row.losses, row.points_for)
+            for row in standings.league_table(self.league)
+        }
+
+    def test_typed_score_columns(self):
+        game = Game.objects.get(pk=1)
+        self.assertEqual((game.home_total, game.away_total), (90, 80))
+        self.assertEqual(game.home_quarter_4, 24)
+        self.assertIsNone(game.home_over_time)
+
+    def test_league_table(self):
+        self.assertEqual(
+            self.table(),
+            {1: (2, 2, 0, 190), 2: (2, 0, 2, 150), 3: (2, 1, 1, 135)},
+        )
+
+    def test_score_change_only_touches_affected_teams(self):
+        ingest_games([scored_payload(4, 4, 5, 50, 40)])
+        untouched = TeamStanding.objects.get(team_id=1).updated_at
+
+        ingest_games([scored_payload(4, 4, 5, 40, 50)])
+        self.assertEqual(
+            TeamStanding.objects.get(team_id=1).updated_at, untouched
+        )
+        self.assertEqual(TeamStanding.objects.get(team_id=5).wins, 1)
+        self.assertEqual(TeamStanding.objects.get(team_id=4).wins, 0)
+
+    def test_unfinished_games_are_ignored(self):
+        payload = game_payload(5, home_id=1, away_id=2)
+        payload["status"] = {
+            "long": "Not Started",
+            "short": "NS",
+            "timer": None,
+        }
+        payload["scores"] = {
+            side: dict.fromkeys(payload["scores"]["home"])
+            for side in ("home", "away")
+        }
+        ingest_games([payload])
+        self.assertEqual(self.table()[1][0], 2)
+
+    def test_moved_team_leaves_old_standing(self):
+        ingest_games([scored_payload(3, 3, 4, 60, 100)])
+        self.assertEqual(self.table()[1], (1, 1, 0, 90))
+        self.assertEqual(self.table()[4], (1, 1, 0, 100))
+
+    def test_admin_edit_refreshes_standings(self):
+        game = Game.objects.get(pk=1)
+        game.home_score = {**game.home_score, "total": 70}
+        game.save()
+        self.assertEqual(self.table()[1][1:3], (1, 1))
+
+    def test_admin_edit_moving_a_game_refreshes_old_standings(self):
+        ingest_games([scored_payload(4, 4, 5, 50, 40, league_id=2)])
+        game = Game.objects.get(pk=3)
+        game.league_id, game.away_team_id = 2, 4
+        game.save()
+        self.assertEqual(self.table()[1], (1, 1, 0, 90))
+        self.assertEqual(self.table()[3], (1, 1, 0, 75))
+        self.assertEqual(
+            TeamStanding.objects.get(league_id=2, team_id=4).played, 2
+        )
+
+    def test_rebuild(self):
+        expected = self.table()
+        TeamStanding.objects.all().delete()
+        standings.rebuild()
+        self.assertEqual(self.table(), expected)
+
+    def test_standings_endpoint(self):
+        url = reverse("league-standings", kwargs={"pk": self.league.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = response.json()["standings"]
+        self.assertEqual([row["team"]["id"] for row in rows], [1, 3, 2])
+        self.assertEqual(rows[0]["position"], 1)
+        self.assertEqual(rows[0]["point_difference"], 50)
+
+    def test_team_stats_endpoint(self):
+        url = reverse("team-stats", kwargs={"pk": 1})
+        token_cache.clear()
+        # Token, user countries, team, standings
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        data = response.json()
+        self.assertEqual((data["played"], data["wins"]), (2, 2))
+        self.assertEqual(data["averages"]["points_for"], 95)
+        self.assertEqual(data["averages"]["quarter_1"], 23.5)
+        self.assertEqual(data["leagues"][0]["league"]["id"], 1)
+
+
+class TestValidation(TestCase):
+    def test_schema_validators_report_every_problem(self):
+        with self.assertRaises(ValidationError) as ctx:
+            StatusValidator()({"long": "Game Finished", "clock": None})
+        self.assertEqual(len(ctx.exception.messages), 2)
+
+        score = dict(
+            game_payload(1)["scores"]["home"], quarter_1="x", total="?"
+        )
+        with self.assertRaises(ValidationError) as ctx:
+            ScoreValidator()(score)
+        self.assertEqual(
+            ctx.exception.messages,
+            ["Couldn't convert x to int.", "Couldn't convert ? to int."],
+        )
+        ScoreValidator()(dict(score, quarter_1="21", total=None))
+
+    def test_validate_games(self):
+        good = game_payload(1)
+        no_status = game_payload(2)
+        del no_status["status"]
+        bad_score = game_payload(3)
+        bad_score["scores"]["away"]["total"] = "N/A"
+        bad_team = game_payload(4)
+        bad_team["teams"]["home"] = {"name": "Nobody"}
+
+        valid, rejected = validate_games(
+            [good, no_status, bad_score, bad_team, "junk"]
+        )
+        self.assertEqual(valid, [good])
+        errors = [errors for _, errors in rejected]
+        self.assertEqual(
+            errors,
+            [
+                ["game: The following keys are missing: status."],
+                ["scores.away: Couldn't convert N/A to int."],
+                ["teams.home: The following keys are missing: id."],
+                ["game: Expected an object, got str."],
+            ],
+        )
+
+    def test_ingest_quarantines_bad_games(self):
+        bad = game_payload(2)
+        bad["date"] = "yesterday"
+        report = ingest_games([game_payload(1), bad, game_payload(3)])
+
+        self.assertEqual(report["game"]["inserted"], 2)
+        self.assertEqual(report["quarantined"], 1)
+        self.assertFalse(Game.objects.filter(pk=2).exists())
+        quarantined = QuarantinedGame.objects.get()
+        self.assertEqual(quarantined.game_id, 2)
+        self.assertEqual(quarantined.payload, bad)
+        self.assertEqual(
+            quarantined.errors, ["date: 'yesterday' is not a valid datetime."]
+        )
+
+    def test_out_of_range_scores_are_quarantined(self):
+        negative = game_payload(2)
+        negative["scores"]["home"]["quarter_1"] = "-5"
+        huge = game_payload(3)
+        huge["scores"]["away"]["total"] = 40000
+        report = ingest_games([game_payload(1), negative, huge])
+
+        self.assertEqual(report["game"]["inserted"], 1)
+        self.assertEqual(report["quarantined"], 2)
+        self.assertEqual(
+            QuarantinedGame.objects.get(game_id=2).errors,
+            ["scores.home: -5 is not between 0 and 32767."],
+        )
+
+    def test_requarantined_game_is_updated(self):
+        bad = game_payload(2)
+        bad["date"] = "yesterday"
+        ingest_games([bad])
+        bad["date"] = "tomorrow"
+        ingest_games([bad, "junk"])
+        ingest_games(["junk"])
+
+        quarantined = QuarantinedGame.objects.get(game_id=2)
+        self.assertEqual(quarantined.payload["date"], "tomorrow")
+        self.assertEqual(
+            QuarantinedGame.objects.filter(game_id=None).count(), 2
+        )
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool(TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(max_size=2, timeout=0.05, check_after=60)
+
+    def acquire(self, check=lambda connection: True):
+        return self.pool.acquire(FakeConnection, check)
+
+    def test_connections_are_reused(self):
+        first = self.acquire()
+        self.pool.release(first)
+        self.assertIs(self.acquire(), first)
+        stats = self.pool.stats()
+        self.assertEqual((stats["created"], stats["reused"]), (1, 1))
+
+    def test_size_is_bounded(self):
+        first = self.acquire()
+        self.acquire()
+        with self.assertRaises(PoolTimeout):
+            self.acquire()
+        self.assertEqual(self.pool.stats()["timeouts"], 1)
+
+        threading.Timer(0.01, self.pool.release, [first]).start()
+        self.assertIs(self.acquire(), first)
+
+    def test_idle_connections_are_checked(self):
+        self.pool.check_after = 0
+        first = self.acquire()
+        self.pool.release(first)
+        second = self.acquire(check=lambda connection: False)
+
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(self.pool.stats()["open"], 1)
+
+    def test_discard_frees_a_slot(self):
+        first = self.acquire()
+        self.acquire()
+        self.pool.discard(first)
+        self.assertTrue(first.closed)
+        self.acquire()
+        self.assertEqual(self.pool.stats()["discarded"], 1)
+
+    def test_failed_connect_frees_a_slot(self):
+        def connect():
+            raise OperationalError("refused")
+
+        for _ in range(3):
+            with self.assertRaises(OperationalError):
+                self.pool.acquire(connect, None)
+        self.assertEqual(self.pool.stats()["open"], 0)
+
+    def test_new_pool_after_fork(self):
+        settings_dict = {"POOL": {"MAX_SIZE": 3}}
+        pool = get_pool("test", settings_dict)
+        self.assertIs(get_pool("test", settings_dict), pool)
+        with mock.patch("os.getpid", return_value=pool.pid + 1):
+            forked = get_pool("test", settings_dict)
+        self.assertIsNot(forked, pool)
+        self.assertEqual(forked.max_size, 3)
+
+
+class TestReplicaRouting(TransactionTestCase):
+    databases = {"default", "replica"}
+    fixtures = ["test_data.json"]
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        romania = Country.objects.get(code="RO")
+        self.tokens = []
+        for username in ("first", "second"):
+            user = User.objects.create(username=username)
+            Profile.objects.create(user=user).countries.add(romania)
+            self.tokens.append(Token.objects.create(user=user).key)
+        self.game = romania.games.filter(user=None).first()
+
+    def request(self, method, url, token):
+        client = APIClient(HTTP_AUTHORIZATION=f"Bearer {token}")
+        with CaptureQueriesContext(
+            connections["default"]
+        ) as primary, CaptureQueriesContext(connections["replica"]) as replica:
+            response = getattr(client, method)(url)
+        self.assertLess(response.status_code, 300)
+        return [q["sql"] for q in primary], [q["sql"] for q in replica]
+
+    def test_reads_use_the_replica(self):
+        url = reverse("game-detail", kwargs={"pk": self.game.pk})
+        primary, replica = self.request("get", url, self.tokens[0])
+        self.assertEqual(primary, [])
+        self.assertTrue(any("authtoken_token" in sql for sql in replica))
+        self.assertTrue(any("basket_game" in sql for sql in replica))
+
+    def test_writer_reads_from_the_primary(self):
+        url = reverse("game-assign", kwargs={"pk": self.game.pk})
+        primary, replica = self.request("patch", url, self.tokens[0])
+        self.assertTrue(any("UPDATE" in sql for sql in primary))
+        self.assertFalse(any("basket_game" in sql for sql in replica))
+
+        url = reverse("game-detail", kwargs={"pk": self.game.pk})
+        primary, replica = self.request("get", url, self.tokens[0])
+        self.assertTrue(any("basket_game" in sql for sql in primary))
+        self.assertFalse(any("basket_game" in sql for sql in replica))
+
+        # Other users still read from the replica
+        primary, replica = self.request(
+            "get", reverse("game-list"), self.tokens[1]
+        )
+        self.assertTrue(any("basket_game" in sql for sql in replica))
+
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            cache.clear()
+            primary, replica = self.request("get", url, self.tokens[0])
+        self.assertTrue(any("basket_game" in sql for sql in replica))
+
+    def test_async_writer_reads_from_the_primary(self):
+        url = reverse("async-game-assign", kwargs={"pk": self.game.pk})
+
+        async def send():
+            return await self.async_client.patch(
+                url, AUTHORIZATION=f"Bearer {self.tokens[0]}"
+            )
+
+        self.assertEqual(async_to_sync(send)().status_code, 200)
+
+        url = reverse("game-detail", kwargs={"pk": self.game.pk})
+        primary, replica = self.request("get", url, self.tokens[0])
+        self.assertTrue(any("basket_game" in sql for sql in primary))
+        self.assertFalse(any("basket_game" in sql for sql in replica))
+
+    @override_settings(GAMES_CACHE_TIMEOUT=300, REPLICA_STICKY_SECONDS=7)
+    def test_replica_pages_are_cached_for_the_sticky_window(self):
+        with mock.patch.object(response_cache, "cache") as backend:
+            backend.get.return_value = None
+            self.request("get", reverse("game-list"), self.tokens[0])
+        timeouts = [
+            call.args[2]
+            for call in backend.set.call_args_list
+            if call.args[0].startswith("games:page:")
+        ]
+        self.assertEqual(timeouts, [7])
+
+    def test_transactions_read_from_the_primary(self):
+        router = PrimaryReplicaRouter()
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Game), "replica")
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Game), "default")
+            with replica_reads(False):
+                self.assertEqual(router.db_for_read(Game), "default")
+        self.assertEqual(router.db_for_read(Game), "default")
+
+
+class TestAdmin(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("root"))
+
+    def changelist_queries(self, games):
+        Game.objects.all().delete()
+        ingest_games(synthetic_games(games))
+        url = reverse("admin:basket_game_changelist")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_game_changelist_queries_do_not_grow(self):
+        self.assertEqual(
+            self.changelist_queries(5), self.changelist_queries(50)
+        )
+
+    def test_game_form_uses_autocomplete_widgets(self):
+        ingest_games(synthetic_games(20))
+        game = Game.objects.first()
+        url = reverse("admin:basket_game_change", args=[game.pk])
+        content = self.client.get(url).content.decode()
+
+        self.assertIn("admin-autocomplete", content)
+        # Only the selected teams are rendered as options
+        self.assertEqual(content.count('<option value="'), 5)
+
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "basket",
+                "model_name": "game",
+                "field_name": "home_team",
+                "term": game.home_team.name,
+            },
+        )
+        ids = [int(item["id"]) for item in response.json()["results"]]
+        self.assertIn(game.home_team_id, ids)
+
+    def test_search_matches_integer_ids(self):
+        ingest_games(synthetic_games(20))
+        game = Game.objects.first()
+        url = reverse("admin:basket_game_changelist")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {"q": str(game.pk)})
+        self.assertEqual(response.context["cl"].result_count, 1)
+        self.assertFalse(any("UPPER(" in q["sql"] for q in ctx))
+        response = self.client.get(url, {"q": "vs"})
+        self.assertEqual(response.context["cl"].result_count, 0)
+
+        team = game.home_team
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "app_label": "basket",
+                "model_name": "game",
+                "field_name": "away_team",
+                "term": str(team.pk),
+            },
+        )
+        ids = [int(item["id"]) for item in response.json()["results"]]
+        self.assertIn(team.pk, ids)
+
+    def test_estimated_count_falls_back_to_count(self):
+        ingest_games(synthetic_games(20))
+        paginator = EstimatedCountPaginator(Game.objects.order_by("pk"), 10)
+        self.assertIsNone(paginator.estimate())
+        self.assertEqual(paginator.count, 20)
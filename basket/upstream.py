@@ -0,0 +1,287 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from basket import metrics
+from basket.exceptions import BadRequestException, UpstreamException
+from basket.streaming import iter_response_items
+
+CHUNK_SIZE = 64 * 1024
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Seconds to wait before retrying, in order of preference
+RETRY_AFTER_HEADERS = (
+    "Retry-After",
+    "X-RateLimit-Reset",
+    "X-RateLimit-Requests-Reset",
+)
+
+
+class BaseUpstreamClient:
+    """Retry policy and stats shared by the sync and async clients"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "bytes_received": 0,
+            "latency_seconds": 0.0,
+        }
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _record(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+
+    def _retry_delay(self, attempt, response=None):
+        backoff = min(
+            settings.UPSTREAM_BACKOFF_MAX,
+            settings.UPSTREAM_BACKOFF_BASE * 2**attempt,
+        )
+        delay = random.uniform(0, backoff)
+        if response is not None:
+            for header in RETRY_AFTER_HEADERS:
+                value = response.headers.get(header)
+                if value:
+                    delay = max(delay, _parse_delay(value))
+                    break
+        return min(delay, settings.UPSTREAM_BACKOFF_MAX)
+
+    def _headers(self):
+        return {
+            "X-RapidAPI-Key": settings.RAPID_API_KEY,
+            "X-RapidAPI-Host": settings.RAPID_API_HOST,
+        }
+
+    def _give_up(self, attempts, error, response):
+        self._record(failures=1)
+        if error is not None:
+            return UpstreamException(str(error))
+        return UpstreamException(
+            f"API-BASKETBALL returned {response.status_code} after "
+            f"{attempts} attempts."
+        )
+
+    def _games_payload(self, payload):
+        if payload["errors"]:
+            raise BadRequestException(payload["errors"])
+        return payload
+
+
+class UpstreamClient(BaseUpstreamClient):
+    """HTTP client for API-BASKETBALL.
+
+    Keeps a pooled keep-alive session, applies connect/read timeouts and
+    retries throttled (429) and failed (5xx) requests with jittered
+    exponential backoff, honouring the server's rate-limit headers. Request
+    counts, retries, bytes received and latency are kept in ``stats``.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=settings.UPSTREAM_POOL_SIZE
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, params=None, stream=False):
+        """GET ``url`` with retries.
+
+        With ``stream`` the body is left unread so it can be consumed with
+        ``iter_content()``; bytes are then counted by ``iter_body()``.
+        """
+        headers = self._headers()
+        timeout = (
+            settings.UPSTREAM_CONNECT_TIMEOUT,
+            settings.UPSTREAM_READ_TIMEOUT,
+        )
+        attempt = 0
+        while True:
+            response = None
+            start = time.monotonic()
+            try:
+                response = self.session.get(
+                    url,
+                    headers=headers,
+                    params=params,
+                    timeout=timeout,
+                    stream=stream,
+                )
+                size = 0 if stream else len(response.content)
+            except requests.RequestException as e:
+                error = e
+            else:
+                error = None
+            elapsed = time.monotonic() - start
+            metrics.record("upstream", elapsed)
+            self._record(
+                requests=1,
+                latency_seconds=elapsed,
+                bytes_received=size if error is None else 0,
+            )
+            retryable = (
+                error is not None or response.status_code in RETRY_STATUSES
+            )
+            if not retryable:
+                if response.status_code >= 400:
+                    response.close()
+                    self._record(failures=1)
+                    raise UpstreamException(
+                        f"API-BASKETBALL returned {response.status_code}."
+                    )
+                return response
+            if response is not None:
+                response.close()
+            if attempt >= settings.UPSTREAM_MAX_RETRIES:
+                raise self._give_up(attempt + 1, error, response)
+            time.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+            self._record(retries=1)
+
+    def fetch_games(self, querystring):
+        """Return the parsed ``/games`` payload, raising on API errors"""
+        payload = self.get(settings.GAMES_ENDPOINT, params=querystring).json()
+        return self._games_payload(payload)
+
+    def iter_body(self, response, chunk_size=CHUNK_SIZE):
+        chunks = response.iter_content(chunk_size)
+        while True:
+            with metrics.timer("upstream"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            self._record(bytes_received=len(chunk))
+            yield chunk
+
+    def stream_games(self, querystring, chunk_size=CHUNK_SIZE):
+        """Yield ``/games`` items one at a time without buffering the body"""
+        response = self.get(
+            settings.GAMES_ENDPOINT, params=querystring, stream=True
+        )
+        with response:
+            yield from iter_response_items(self.iter_body(response, chunk_size))
+
+
+class AsyncUpstreamClient(BaseUpstreamClient):
+    """``UpstreamClient`` for event loops, built on ``httpx.AsyncClient``.
+
+    Waiting on API-BASKETBALL does not hold a thread, so many requests can
+    be in flight at once, up to ``UPSTREAM_POOL_SIZE`` connections. The
+    connection pool belongs to the event loop the client is first used on;
+    use ``get_async_client()`` to get the one of the running loop.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.UPSTREAM_READ_TIMEOUT,
+                connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_POOL_SIZE,
+                max_keepalive_connections=settings.UPSTREAM_POOL_SIZE,
+            ),
+        )
+
+    async def get(self, url, params=None):
+        """GET ``url`` with the same retries as ``UpstreamClient.get``"""
+        headers = self._headers()
+        attempt = 0
+        while True:
+            response = None
+            start = time.monotonic()
+            try:
+                response = await self.client.get(
+                    url, headers=headers, params=params
+                )
+            except httpx.TransportError as e:
+                error = e
+            else:
+                error = None
+            elapsed = time.monotonic() - start
+            metrics.record("upstream", elapsed)
+            self._record(
+                requests=1,
+                latency_seconds=elapsed,
+                bytes_received=0 if error else len(response.content),
+            )
+            retryable = (
+                error is not None or response.status_code in RETRY_STATUSES
+            )
+            if not retryable:
+                if response.status_code >= 400:
+                    self._record(failures=1)
+                    raise UpstreamException(
+                        f"API-BASKETBALL returned {response.status_code}."
+                    )
+                return response
+            if attempt >= settings.UPSTREAM_MAX_RETRIES:
+                raise self._give_up(attempt + 1, error, response)
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+            self._record(retries=1)
+
+    async def fetch_games(self, querystring):
+        """Return the parsed ``/games`` payload, raising on API errors"""
+        response = await self.get(settings.GAMES_ENDPOINT, params=querystring)
+        return self._games_payload(response.json())
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def _parse_delay(value):
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide client, creating a new one after a fork"""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = UpstreamClient()
+            _client_pid = os.getpid()
+        return _client
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Return the async client of the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncUpstreamClient()
+    return client
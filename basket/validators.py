@@ -1,50 +1,223 @@
 from django.core.exceptions import ValidationError
+from django.utils.dateparse import parse_datetime
 from django.utils.deconstruct import deconstructible
 
+STATUS_KEYS = frozenset({"long", "short", "timer"})
+# Ordered, Game has a typed column per key and side
+SCORE_KEYS = (
+    "quarter_1",
+    "quarter_2",
+    "quarter_3",
+    "quarter_4",
+    "over_time",
+    "total",
+)
+_SCORE_KEY_SET = frozenset(SCORE_KEYS)
+# Largest value Game's PositiveSmallIntegerField score columns accept
+MAX_SCORE = 32767
+
+
+def _is_int(value):
+    if type(value) is int or value is None or value == "":
+        return True
+    if isinstance(value, str):
+        return value.strip().lstrip("+-").isdigit()
+    try:
+        int(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _is_score(value):
+    if type(value) is int:
+        return 0 <= value <= MAX_SCORE
+    if value is None or value == "":
+        return True
+    return _is_int(value) and 0 <= int(value) <= MAX_SCORE
+
+
+def _key_errors(value, expected, label=""):
+    """Messages for missing and unexpected keys of a dict"""
+    prefix = f"{label}: " if label else ""
+    if not isinstance(value, dict):
+        return [f"{prefix}Expected an object, got {type(value).__name__}."]
+    errors = []
+    keys = value.keys()
+    if keys != expected:
+        missing = expected - keys
+        extra = keys - expected
+        if missing:
+            errors.append(
+                f"{prefix}The following keys are missing: "
+                f"{', '.join(sorted(missing))}."
+            )
+        if extra:
+            errors.append(
+                f"{prefix}Invalid keys '{extra}'. "
+                f"The accepted keys are: {', '.join(sorted(expected))}."
+            )
+    return errors
+
+
+def _score_errors(value, label=""):
+    errors = _key_errors(value, _SCORE_KEY_SET, label)
+    if isinstance(value, dict):
+        prefix = f"{label}: " if label else ""
+        for item in value.values():
+            if not _is_int(item):
+                errors.append(f"{prefix}Couldn't convert {item} to int.")
+            elif not _is_score(item):
+                errors.append(
+                    f"{prefix}{item} is not between 0 and {MAX_SCORE}."
+                )
+    return errors
+
 
 @deconstructible
 class BaseSchemaValidator:
+    expected_keys = frozenset()
+
+    def errors(self, value):
+        return _key_errors(value, self.expected_keys)
+
     def __call__(self, value):
-        # import ipdb
-
-        # ipdb.set_trace()
-        actual_keys = set(value.keys())
-        missing_keys = self.expected_keys - actual_keys
-        extra_keys = actual_keys - self.expected_keys
-        if missing_keys:
-            raise ValidationError(
-                f"The following keys are missing: {', '.join(missing_keys)}."
-            )
-        if extra_keys:
-            raise ValidationError(
-                f"Invalid keys '{extra_keys}'. "
-                f"The accepted keys are: {', '.join(self.expected_keys)}."
-            )
+        errors = self.errors(value)
+        if errors:
+            raise ValidationError(errors)
 
 
 class StatusValidator(BaseSchemaValidator):
-    expected_keys = {
-        "long",
-        "short",
-        "timer",
-    }
+    expected_keys = STATUS_KEYS
 
 
 class ScoreValidator(BaseSchemaValidator):
-    expected_keys = {
-        "quarter_1",
-        "quarter_2",
-        "quarter_3",
-        "quarter_4",
-        "over_time",
-        "total",
+    expected_keys = _SCORE_KEY_SET
+
+    def errors(self, value):
+        return _score_errors(value)
+
+
+# Keys of an upstream /games item that ingest relies on
+GAME_KEYS = frozenset(
+    {
+        "id",
+        "date",
+        "time",
+        "timestamp",
+        "timezone",
+        "status",
+        "league",
+        "country",
+        "teams",
+        "scores",
     }
+)
+LEAGUE_KEYS = frozenset({"id", "name", "type", "season"})
+COUNTRY_KEYS = frozenset({"id", "name"})
+TEAM_KEYS = frozenset({"id", "name"})
+SIDES = frozenset({"home", "away"})
 
-    def __call__(self, value):
-        super().__call__(value)
-        for value in value.values():
-            if value:
-                try:
-                    int(value)
-                except Exception:
-                    raise ValidationError(f"Couldn't convert {value} to int.")
+
+def _required_errors(value, required, label):
+    """Like _key_errors, but extra keys are allowed"""
+    if not isinstance(value, dict):
+        return [f"{label}: Expected an object, got {type(value).__name__}."]
+    missing = required - value.keys()
+    if missing:
+        return [
+            f"{label}: The following keys are missing: "
+            f"{', '.join(sorted(missing))}."
+        ]
+    if type(value["id"]) is not int:
+        return [f"{label}: id must be an integer."]
+    return []
+
+
+def game_errors(game):
+    """Every problem with one upstream game dict, as a list of messages"""
+    errors = _required_errors(game, GAME_KEYS, "game")
+    if errors:
+        return errors
+    date = game["date"]
+    if not isinstance(date, str) or not _parses_as_datetime(date):
+        errors.append(f"date: {date!r} is not a valid datetime.")
+    if not _is_int(game["timestamp"]) or game["timestamp"] in (None, ""):
+        errors.append(f"timestamp: {game['timestamp']!r} is not an integer.")
+    errors.extend(_key_errors(game["status"], STATUS_KEYS, "status"))
+    errors.extend(_required_errors(game["league"], LEAGUE_KEYS, "league"))
+    errors.extend(_required_errors(game["country"], COUNTRY_KEYS, "country"))
+    for name in ("teams", "scores"):
+        sides = game[name]
+        if not isinstance(sides, dict) or not SIDES <= sides.keys():
+            errors.append(f"{name}: Expected home and away.")
+            continue
+        for side in ("home", "away"):
+            label = f"{name}.{side}"
+            if name == "teams":
+                errors.extend(_required_errors(sides[side], TEAM_KEYS, label))
+            else:
+                errors.extend(_score_errors(sides[side], label))
+    return errors
+
+
+def _parses_as_datetime(value):
+    try:
+        return parse_datetime(value) is not None
+    except ValueError:
+        return False
+
+
+def _is_valid(game):
+    """Fast check for the common case, with no messages.
+
+    Returns the same verdict as ``game_errors(game) == []``.
+    """
+    try:
+        if not game.keys() >= GAME_KEYS or game["status"].keys() != STATUS_KEYS:
+            return False
+        for value, required in (
+            (game["league"], LEAGUE_KEYS),
+            (game["country"], COUNTRY_KEYS),
+            (game["teams"]["home"], TEAM_KEYS),
+            (game["teams"]["away"], TEAM_KEYS),
+        ):
+            if not value.keys() >= required or type(value["id"]) is not int:
+                return False
+        for score in (game["scores"]["home"], game["scores"]["away"]):
+            if score.keys() != _SCORE_KEY_SET:
+                return False
+            for value in score.values():
+                if not _is_score(value):
+                    return False
+        timestamp = game["timestamp"]
+        if type(timestamp) is not int and (
+            timestamp in (None, "") or not _is_int(timestamp)
+        ):
+            return False
+        return _parses_as_datetime(game["date"])
+    except (AttributeError, KeyError, TypeError):
+        return False
+
+
+def validate_games(games):
+    """Split upstream game dicts into valid ones and rejected ones.
+
+    Checks the whole batch in one pass without raising, so one malformed
+    game does not abort the others. Well-formed games only go through a
+    cheap check against precomputed key sets; error messages are built for
+    the rejected ones alone. Returns ``(valid, rejected)`` where
+    ``rejected`` is a list of ``(game, errors)`` pairs.
+    """
+    valid = []
+    rejected = []
+    for game in games:
+        if _is_valid(game):
+            valid.append(game)
+            continue
+        errors = game_errors(game)
+        if errors:
+            rejected.append((game, errors))
+        else:
+            valid.append(game)
+    return valid, rejected
@@ -1,98 +1,132 @@
-import requests
 from django.conf import settings
 from django.db.models import Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
 
+from basket import cache as response_cache
+from basket import conditional, metrics, routers, standings
+from basket.assignment import (
+    BULK_RESULTS,
+    assign_game,
+    bulk_assign,
+    claim_next_game,
+    game_pk,
+    user_countries,
+)
+from basket.dates import day_range
 from basket.exceptions import BadRequestException
-from basket.models import Country, Game, League, Team
-from basket.serializers import GameSerializer
+from basket.ingest import upstream_queries
+from basket.jobs import enqueue_refresh
+from basket.models import Game, League, RefreshJob, Team
+from basket.pagination import GameCursorPagination
+from basket.renderers import NDJSONRenderer, ndjson_line
+from basket.serializers import (
+    BulkAssignSerializer,
+    FastGameSerializer,
+    GameSerializer,
+    LeagueSerializer,
+    RefreshJobSerializer,
+    TeamLeagueStatsSerializer,
+    TeamSerializer,
+    TeamStandingSerializer,
+)
 
+# Querystring options of the game endpoints
+GAME_FILTERS = (
+    "date",
+    "date_from",
+    "date_to",
+    "league",
+    "season",
+    "status",
+    "team",
+)
 
-def refresh_db(querystring):
-    """Pull data from API-BASKETBALL and store it locally"""
-    url = settings.GAMES_ENDPOINT
 
-    headers = {
-        "X-RapidAPI-Key": settings.RAPID_API_KEY,
-        "X-RapidAPI-Host": settings.RAPID_API_HOST,
+def game_querystring(query_params):
+    return {
+        option: query_params.get(option)
+        for option in GAME_FILTERS
+        if query_params.get(option)
     }
-    response = requests.request("GET", url, headers=headers, params=querystring)
-    errors = response.json()["errors"]
-    if errors:
-        raise BadRequestException(errors)
-    games = response.json()["response"]
-    for game_dict in games:
-        league, _ = League.objects.get_or_create(
-            id=game_dict["league"]["id"], defaults=game_dict["league"]
-        )
-        game_dict["league"] = league
-        country, _ = Country.objects.get_or_create(
-            id=game_dict["country"]["id"], defaults=game_dict["country"]
-        )
-        game_dict["country"] = country
-        home_team, _ = Team.objects.get_or_create(
-            id=game_dict["teams"]["home"]["id"],
-            defaults=game_dict["teams"]["home"],
-        )
-        game_dict["home_team"] = home_team
-        away_team, _ = Team.objects.get_or_create(
-            id=game_dict["teams"]["away"]["id"],
-            defaults=game_dict["teams"]["away"],
-        )
-        game_dict["away_team"] = away_team
-        del game_dict["teams"]
 
-        game_dict["home_score"] = game_dict["scores"]["home"]
-        game_dict["away_score"] = game_dict["scores"]["away"]
-        del game_dict["scores"]
 
-        Game.objects.update_or_create(id=game_dict["id"], defaults=game_dict)
+def parse_id(value, option):
+    """Parse an id querystring value"""
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequestException(f"Invalid {option}: {value}")
+
+
+def visible_games(queryset, user, params):
+    """Games of ``queryset`` matching the querystring ``params`` that
+    ``user`` is allowed to see"""
+    params = dict(params)
+    if "season" in params:
+        params["league__season"] = params.pop("season")
+    # Ranges on the column itself can use the (date, id) indexes,
+    # unlike date__date which wraps it in a function
+    if "date" in params:
+        params["date__gte"], params["date__lt"] = day_range(params.pop("date"))
+    if "status" in params:
+        params["status__short__in"] = params.pop("status").split(",")
+
+    qs = queryset
+    if "date_from" in params:
+        qs = qs.filter(date__gte=day_range(params.pop("date_from"))[0])
+    if "date_to" in params:
+        qs = qs.filter(date__lt=day_range(params.pop("date_to"))[1])
+    if "team" in params:
+        team = parse_id(params.pop("team"), "team")
+        qs = qs.filter(Q(home_team=team) | Q(away_team=team))
+    if params:
+        qs = qs.filter(**params)
+    if not user.is_staff:
+        qs = qs.filter(country__in=user_countries(user)).filter(
+            Q(user=None) | Q(user=user)
+        )
+    return qs
 
 
 class GameViewSet(viewsets.ModelViewSet):
-    queryset = Game.objects.all()
+    queryset = Game.objects.select_related(
+        "league", "country", "home_team", "away_team"
+    )
     serializer_class = GameSerializer
+    # Used instead of serializer_class to render game lists
+    fast_serializer = FastGameSerializer()
+    pagination_class = GameCursorPagination
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ["get", "head", "patch", "delete"]
 
+    def dispatch(self, request, *args, **kwargs):
+        # Refreshes write, and read only to decide what to write
+        reads = request.method in permissions.SAFE_METHODS
+        if request.GET.get("refresh"):
+            reads = False
+        with routers.replica_reads(reads):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        routers.identify(request.user)
+
+    def get_querystring(self):
+        return game_querystring(self.request.query_params)
+
     def get_queryset(self):
-        user_is_admin = self.request.user.is_staff
-        refresh = bool(self.request.query_params.get("refresh"))
-        options = ["date", "league", "season", "team"]
-        querystring = {
-            option: self.request.query_params.get(option)
-            for option in options
-            if self.request.query_params.get(option)
-        }
-        if refresh:
-            if not user_is_admin:
-                raise (
-                    PermissionDenied(
-                        "Only admin users can refresh the local DB with data "
-                        "from RapidAPI."
-                    )
-                )
-            refresh_db(querystring)
-        params = {**querystring}
-        if "season" in params:
-            params["league__season"] = params.pop("season")
-        if "date" in params:
-            params["date__date"] = params.pop("date")
-
-        qs = super().get_queryset()
-        if params:
-            qs = qs.filter(**params)
-        if not user_is_admin:
-            countries = []
-            if self.request.user.profile:
-                countries = self.request.user.profile.countries.all()
-            qs = qs.filter(country__in=countries).filter(
-                Q(user=None) | Q(user=self.request.user)
-            )
-        return qs
+        return visible_games(
+            super().get_queryset(), self.request.user, self.get_querystring()
+        )
 
     def get_permissions(self):
         if self.action == "assign":
@@ -100,6 +134,10 @@ class GameViewSet(viewsets.ModelViewSet):
             self.http_method_names = ["get", "head", "patch"]
             # Set the permissions for the "assign" action
             self.permission_classes = [permissions.IsAuthenticated]
+        elif self.action == "claim_next":
+            # "claim_next" is the only action that accepts POST
+            self.http_method_names = ["post"]
+            self.permission_classes = [permissions.IsAuthenticated]
         elif self.request.method in ["PATCH", "DELETE"]:
             # Require admin status for PATCH and DELETE methods on other actions
             self.permission_classes = [permissions.IsAdminUser]
@@ -109,22 +147,228 @@ class GameViewSet(viewsets.ModelViewSet):
 
         return super().get_permissions()
 
+    def list(self, request, *args, **kwargs):
+        if bool(request.query_params.get("refresh")):
+            return self.refresh(request)
+        return self.paginated_response(
+            self.filter_queryset(self.get_queryset())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        # The validators query runs before get_object(), so malformed pks
+        # must be turned into a 404 here
+        pk = game_pk(kwargs[self.lookup_url_kwarg or "pk"])
+        queryset = self.filter_queryset(self.get_queryset()).filter(pk=pk)
+        not_modified = self.check_not_modified(queryset, dated=True)
+        if not_modified is not None:
+            return not_modified
+        return self.add_validators(Response(self.serialize(self.get_object())))
+
+    def serialize(self, game):
+        with metrics.timer("serialize"):
+            return self.get_serializer(game).data
+
+    def check_not_modified(self, queryset, dated=False):
+        """Return a 304 response if the client's copy of ``queryset`` is
+        still current, computing the validators for ``add_validators``.
+
+        Only ``dated`` responses get a Last-Modified. A list does not: a
+        game leaving it (assigned to someone else, deleted) changes the
+        list without making any of the remaining rows newer.
+        """
+        label, _ = response_cache.get_scope(self.request.user)
+        self.etag, last_modified = conditional.validators(
+            queryset,
+            self.request.get_full_path(),
+            label,
+            self.request.accepted_renderer.format,
+        )
+        self.last_modified = (
+            int(last_modified.timestamp()) if dated and last_modified else None
+        )
+        response = get_conditional_response(
+            self.request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None:
+            response = self.add_validators(response)
+        return response
+
+    def add_validators(self, response):
+        if response.status_code in (200, 304):
+            response["ETag"] = self.etag
+            if self.last_modified is not None:
+                response["Last-Modified"] = http_date(self.last_modified)
+        return response
+
+    def refresh(self, request):
+        if not request.user.is_staff:
+            raise (
+                PermissionDenied(
+                    "Only admin users can refresh the local DB with data "
+                    "from RapidAPI."
+                )
+            )
+        querystring = self.get_querystring()
+        # Reject bad date ranges now rather than in the worker
+        upstream_queries(querystring)
+        job = enqueue_refresh(querystring, user=request.user)
+        url = reverse(
+            "refreshjob-detail", kwargs={"pk": job.pk}, request=request
+        )
+        return Response(
+            {"id": job.pk, "status": job.status, "url": url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": url},
+        )
+
+    def paginated_response(self, queryset):
+        """Render a page of ``queryset``, or 304 if the client has it.
+
+        Cached pages keep their validators, so neither a cache hit nor a
+        conditional request answered from the cache runs the validator
+        aggregate over the whole result set.
+        """
+        if self.request.accepted_renderer.format == NDJSONRenderer.format:
+            return self.conditional_response(
+                queryset, lambda: self.streaming_response(queryset)
+            )
+        if settings.GAMES_CACHE_TIMEOUT <= 0:
+            return self.conditional_response(
+                queryset, lambda: self.page_response(queryset)
+            )
+        key = response_cache.response_key(self.request, self.action)
+        cached = response_cache.get(key)
+        if cached is not None:
+            data, self.etag, self.last_modified = cached
+            response = get_conditional_response(
+                self.request, etag=self.etag, last_modified=self.last_modified
+            )
+            return self.add_validators(response or Response(data))
+        response = self.conditional_response(
+            queryset, lambda: self.page_response(queryset)
+        )
+        if response.status_code == status.HTTP_200_OK:
+            timeout = settings.GAMES_CACHE_TIMEOUT
+            if queryset.db == routers.REPLICA_DB_ALIAS:
+                # The replica may lag behind an invalidation, don't serve
+                # what it returned for longer than a write stays sticky
+                timeout = min(timeout, settings.REPLICA_STICKY_SECONDS)
+            response_cache.set(
+                key, (response.data, self.etag, self.last_modified), timeout
+            )
+        return response
+
+    def conditional_response(self, queryset, build):
+        not_modified = self.check_not_modified(queryset)
+        if not_modified is not None:
+            return not_modified
+        return self.add_validators(build())
+
+    def page_response(self, queryset):
+        rows = queryset.values(*self.fast_serializer.columns)
+        page = self.paginate_queryset(rows)
+        with metrics.timer("serialize"):
+            data = [self.fast_serializer.to_representation(row) for row in page]
+        return self.get_paginated_response(data)
+
+    def streaming_response(self, queryset):
+        """Stream every game in ``queryset`` as NDJSON, bypassing pagination.
+
+        Rows are read through a server-side cursor in chunks and serialized
+        one at a time, so memory use stays constant for any result size.
+        """
+        # Rows are read after dispatch() returns, pick the database now
+        queryset = queryset.using(queryset.db)
+        games = self.fast_serializer.serialize(
+            queryset.order_by("date", "id"),
+            chunk_size=settings.GAMES_STREAM_CHUNK_SIZE,
+        )
+        lines = (ndjson_line(game) for game in games)
+        return StreamingHttpResponse(
+            lines, content_type=NDJSONRenderer.media_type
+        )
+
     @action(detail=False, methods=["get"])
     def assigned(self, request):
         games = self.get_queryset().filter(user=self.request.user)
-        serializer = self.get_serializer(games, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(games)
 
     @action(detail=False, methods=["get"])
     def unassigned(self, request):
         games = self.get_queryset().filter(user=None)
-        serializer = self.get_serializer(games, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(games)
 
     @action(detail=True, methods=["patch"])
     def assign(self, request, pk=None):
-        game = self.get_object()
-        game.user = request.user
-        game.save()
-        serializer = self.get_serializer(game)
-        return Response(serializer.data)
+        game = assign_game(pk, request.user, queryset=self.queryset)
+        return Response(self.serialize(game))
+
+    @action(detail=False, methods=["post"], url_path="claim-next")
+    def claim_next(self, request):
+        # Filters (league, date, ...) come from the querystring
+        game = claim_next_game(request.user, queryset=self.get_queryset())
+        if game is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(self.serialize(game))
+
+    @action(detail=False, methods=["patch"], url_path="bulk-assign")
+    def bulk_assign(self, request):
+        # Admin only, like every PATCH other than "assign"
+        serializer = BulkAssignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_assign(
+            serializer.validated_data["games"],
+            serializer.validated_data["user"],
+        )
+        counts = dict.fromkeys(BULK_RESULTS, 0)
+        for result in results:
+            counts[result["result"]] += 1
+        return Response({"counts": counts, "results": results})
+
+
+class RefreshJobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = RefreshJob.objects.order_by("-created_at")
+    serializer_class = RefreshJobSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+
+class LeagueViewSet(viewsets.GenericViewSet):
+    queryset = League.objects.all()
+    serializer_class = LeagueSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=True, methods=["get"])
+    def standings(self, request, pk=None):
+        league = self.get_object()
+        table = TeamStandingSerializer(
+            standings.league_table(league), many=True
+        ).data
+        for position, row in enumerate(table, start=1):
+            row["position"] = position
+        return Response(
+            {"league": self.get_serializer(league).data, "standings": table}
+        )
+
+
+class TeamViewSet(viewsets.GenericViewSet):
+    queryset = Team.objects.all()
+    serializer_class = TeamSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=True, methods=["get"])
+    def stats(self, request, pk=None):
+        team = self.get_object()
+        stats = standings.team_stats(team)
+        stats["leagues"] = TeamLeagueStatsSerializer(
+            stats["leagues"], many=True
+        ).data
+        return Response({"team": self.get_serializer(team).data, **stats})
+
+
+def prometheus_metrics(request):
+    """Request histograms and cache counters for Prometheus to scrape"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(
+        metrics.expose(), content_type="text/plain; version=0.0.4"
+    )
@@ -15,5 +15,5 @@ if not User.objects.filter(username='root').exists():
     User.objects.create_superuser('root', '', 'root')
 EOF
 
-# Start the Django development server
+# Start the server (runserver, or gunicorn in docker-compose.prod.yml)
 exec "$@"
@@ -0,0 +1,28 @@
+"""Gunicorn settings for the production profile (docker-compose.prod.yml).
+
+Each worker is a process with ``GUNICORN_THREADS`` threads. Set
+``DB_POOL_MAX_SIZE`` to at least the thread count, and keep workers x pool
+size under the database's ``max_connections``; every worker logs the
+numbers as it starts.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(
+    os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1)
+)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = 5
+# Recycle workers now and then to bound memory growth
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = "-"
+
+
+def post_worker_init(worker):
+    from basket.db.pool import log_sizing
+
+    log_sizing(worker.cfg.workers, worker.cfg.threads)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,9 +27,13 @@ SECRET_KEY = (
 )
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DJANGO_DEBUG", "1").lower() in ("1", "true", "yes")
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host
+    for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",")
+    if host
+]
 
 
 # Application definition
@@ -47,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Removes itself unless METRICS_ENABLED is set (see basket/metrics.py)
+    "basket.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -79,15 +86,63 @@ WSGI_APPLICATION = "project.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
+# Setting DB_POOL_MAX_SIZE switches to basket.db.backends.postgresql, which
+# keeps up to that many connections per process in a pool and hands them
+# back after each request. Otherwise each thread may keep its connection
+# for CONN_MAX_AGE seconds.
+
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE") or 0)
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "basket.db.backends.postgresql"
+            if DB_POOL_MAX_SIZE
+            else "django.db.backends.postgresql"
+        ),
         "NAME": os.environ.get("POSTGRES_DB"),
         "USER": os.environ.get("POSTGRES_USER"),
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD"),
         "HOST": "db",
         "PORT": 5432,
+        # Keep at 0 with the pool, and under runserver (a thread per request)
+        "CONN_MAX_AGE": int(os.environ.get("CONN_MAX_AGE") or 0),
+        "CONN_HEALTH_CHECKS": True,
+        "POOL": {
+            "MAX_SIZE": DB_POOL_MAX_SIZE,
+            "TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT") or 10),
+        },
+    }
+}
+
+# A read replica of default, used for game reads and token lookups (see
+# basket/routers.py). Tests always get one, as a mirror of the test database.
+POSTGRES_REPLICA_HOST = os.environ.get("POSTGRES_REPLICA_HOST")
+
+if POSTGRES_REPLICA_HOST or sys.argv[1:2] == ["test"]:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": POSTGRES_REPLICA_HOST or DATABASES["default"]["HOST"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["basket.routers.PrimaryReplicaRouter"]
+# Seconds a user's reads stay on the primary after they wrote something
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# The local-memory backend is per process; use the file-based backend
+# (django.core.cache.backends.filebased.FileBasedCache with a directory as
+# LOCATION) to share cached responses and invalidations between workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "basket"),
     }
 }
 
@@ -137,10 +192,54 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "basket.auth.BearerTokenAuthentication",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "basket.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
+# Keyset pagination of the games endpoints (see basket/pagination.py)
+
+GAMES_PAGE_SIZE = 100
+GAMES_MAX_PAGE_SIZE = 1000
+# Rows fetched per round trip when streaming games as NDJSON
+GAMES_STREAM_CHUNK_SIZE = 2000
+# Seconds game list responses are cached for (see basket/cache.py), 0 disables
+GAMES_CACHE_TIMEOUT = int(os.environ.get("GAMES_CACHE_TIMEOUT", 300))
+
+# In-process cache of authenticated tokens (see basket/auth.py)
+
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", 10000))
+AUTH_TOKEN_CACHE_TTL = float(os.environ.get("AUTH_TOKEN_CACHE_TTL", 60))
+
+# Server-Timing headers and Prometheus metrics at /metrics (see
+# basket/metrics.py). /metrics is not authenticated, keep it off the
+# public network when enabling this.
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
 # API-BASKETBALL
 
 RAPID_API_HOST = "api-basketball.p.rapidapi.com"
 RAPID_API_KEY = os.environ.get("RAPID_API_KEY")
 GAMES_ENDPOINT = "https://api-basketball.p.rapidapi.com/games"
+# /games only takes a single date, so ranges cost one request per day
+REFRESH_MAX_DAYS = int(os.environ.get("REFRESH_MAX_DAYS", 31))
+# Seconds after which a running refresh job is assumed abandoned by a
+# crashed worker and queued again (see basket/jobs.py)
+REFRESH_JOB_TIMEOUT = int(os.environ.get("REFRESH_JOB_TIMEOUT", 3600))
+
+# Upstream HTTP client (see basket/upstream.py)
+
+UPSTREAM_CONNECT_TIMEOUT = float(
+    os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 3.05)
+)
+UPSTREAM_READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", 30))
+UPSTREAM_MAX_RETRIES = int(os.environ.get("UPSTREAM_MAX_RETRIES", 4))
+UPSTREAM_BACKOFF_BASE = float(os.environ.get("UPSTREAM_BACKOFF_BASE", 0.5))
+UPSTREAM_BACKOFF_MAX = float(os.environ.get("UPSTREAM_BACKOFF_MAX", 60))
+UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", 10))
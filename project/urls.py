@@ -17,12 +17,39 @@ from django.contrib import admin
 from django.urls import include, path
 from rest_framework import routers
 
-from basket.views import GameViewSet
+from basket import async_views
+from basket.views import (
+    GameViewSet,
+    LeagueViewSet,
+    RefreshJobViewSet,
+    TeamViewSet,
+    prometheus_metrics,
+)
 
 router = routers.DefaultRouter()
 router.register(r"games", GameViewSet)
+router.register(r"leagues", LeagueViewSet)
+router.register(r"teams", TeamViewSet)
+router.register(r"refresh-jobs", RefreshJobViewSet)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", prometheus_metrics, name="metrics"),
     path("", include(router.urls)),
+    # Async versions of the hottest endpoints, for ASGI (see project/asgi.py)
+    path(
+        "async/games/",
+        async_views.game_list,
+        name="async-game-list",
+    ),
+    path(
+        "async/games/<int:pk>/",
+        async_views.game_detail,
+        name="async-game-detail",
+    ),
+    path(
+        "async/games/<int:pk>/assign/",
+        async_views.game_assign,
+        name="async-game-assign",
+    ),
 ]